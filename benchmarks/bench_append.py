@@ -0,0 +1,46 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+escalamiento de las adiciones repetidas (append=True) segun la
+cantidad de lineas de factura y de horas extras de nomina.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from facho.fe.form_xml import DIANInvoiceXML
+
+import fixtures
+
+
+def measure(build, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        build()
+    return (time.perf_counter() - start) / rounds
+
+
+def run_invoice(lines, rounds):
+    inv = fixtures.invoice(lines)
+    elapsed = measure(lambda: DIANInvoiceXML(inv), rounds)
+    print("%6d invoice lines: %9.2f ms/doc %7.1f us/line" % (
+        lines, elapsed * 1000, elapsed * 1e6 / lines))
+
+
+def run_nomina(horas_extras, rounds):
+    # los devengados se aplican al adicionarlos
+    elapsed = measure(lambda: fixtures.nomina(horas_extras).toFachoXML(), rounds)
+    print("%6d horas extras:  %9.2f ms/doc %7.1f us/hora" % (
+        horas_extras, elapsed * 1000, elapsed * 1e6 / horas_extras))
+
+
+if __name__ == '__main__':
+    for lines, rounds in [(100, 20), (1000, 3), (10000, 1)]:
+        run_invoice(lines, rounds)
+    for horas_extras, rounds in [(100, 20), (1000, 3), (10000, 1)]:
+        run_nomina(horas_extras, rounds)
@@ -0,0 +1,42 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+documentos por segundo de facho.fe.batch segun cantidad de procesos.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+from facho.fe import batch
+
+
+class Builder(batch.InvoiceBuilder):
+
+    def invoice(self, spec):
+        inv = fixtures.invoice(spec['lines'])
+        inv.set_ident('SETP%d' % (spec['index']))
+        return inv
+
+    def extensions(self, invoice):
+        return fixtures.extensions(invoice)
+
+
+def run(processes, documents, lines=10):
+    specs = ({'index': i, 'lines': lines} for i in range(documents))
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = batch.InvoiceBatch(Builder(), output_dir, processes=processes)
+        for _ in generator.run(specs):
+            pass
+
+    print("%2d procesos x %4d docs: %s" % (processes, documents, generator.report))
+
+
+if __name__ == '__main__':
+    for processes in sorted({1, 2, os.cpu_count() or 1}):
+        run(processes, 500)
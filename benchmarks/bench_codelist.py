@@ -0,0 +1,35 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+tiempo de importacion de las listas de codigos, sin cache
+y con la cache precompilada.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODE = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "from facho.fe.data.dian import codelist\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def import_time(cache_dir):
+    env = dict(os.environ, FACHO_CACHE_DIR=cache_dir,
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    out = subprocess.check_output([sys.executable, '-c', CODE], env=env, text=True)
+    return float(out) * 1000
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print("codelist import sin cache: %7.1f ms" % (import_time(cache_dir)))
+        print("codelist import con cache: %7.1f ms" % (import_time(cache_dir)))
@@ -0,0 +1,65 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+peticiones por segundo de DianSignatureClient contra el servidor
+local DianStub, en serie y concurrentes con AsyncDianClient.
+
+    python benchmarks/bench_dian_stub.py [peticiones] [latencia]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facho.fe.client import dian
+from facho.fe.client.dian_async import AsyncDianClient
+from facho.fe.client.stub import DianStub
+
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests')
+KEY = os.path.join(TESTS_DIR, 'example.key')
+CERT = os.path.join(TESTS_DIR, 'example.pem')
+
+
+def report(name, count, elapsed):
+    print("%-28s %4d requests %.3fs %.1f requests/s" % (name, count, elapsed, count / elapsed))
+
+
+def run_serial(stub, count):
+    client = dian.DianSignatureClient(KEY, CERT, wsdl=stub.wsdl)
+    client.request(dian.GetStatus('warmup'))
+
+    start = time.perf_counter()
+    for i in range(count):
+        client.request(dian.GetStatus('track%d' % (i)))
+    report('serial', count, time.perf_counter() - start)
+
+
+def run_async(stub, count, concurrency):
+    client = dian.DianSignatureClient(KEY, CERT, wsdl=stub.wsdl)
+    client.request(dian.GetStatus('warmup'))
+
+    async def gather():
+        async with AsyncDianClient(client, concurrency=concurrency) as async_client:
+            return await async_client.gather_status(['track%d' % (i) for i in range(count)])
+
+    start = time.perf_counter()
+    asyncio.run(gather())
+    report('async concurrency=%d' % (concurrency), count, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    dian.WSDL_CACHE_PATH = os.path.join(tempfile.mkdtemp(), 'wsdl.sqlite')
+
+    with DianStub(latency=latency, certfile=CERT) as stub:
+        print("stub latency %.3fs, WS-Security verified" % (latency))
+        run_serial(stub, count)
+        for concurrency in (4, 16):
+            run_async(stub, count, concurrency)
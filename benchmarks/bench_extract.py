@@ -0,0 +1,66 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+lectura de varios campos por documento (CUNE, codigo de seguridad,
+validate) sobre nominas con muchas horas extras.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+
+CUNE_FIELDS = [
+    '/NumeroSecuenciaXML/@Numero',
+    '/InformacionGeneral/@FechaGen',
+    '/InformacionGeneral/@HoraGen',
+    '/DevengadosTotal',
+    '/DeduccionesTotal',
+    '/ComprobanteTotal',
+    '/Empleador/@NIT',
+    '/Trabajador/@NumeroDocumento',
+    '/InformacionGeneral/@TipoXML',
+    '/InformacionGeneral/@Ambiente',
+]
+
+
+def measure(call, rounds):
+    call()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        call()
+    return (time.perf_counter() - start) * 1e6 / rounds
+
+
+def run(horas_extras, rounds):
+    nomina = fixtures.nomina(horas_extras)
+    xml = nomina.toFachoXML()
+
+    cune = measure(lambda: nomina.informacion_general.post_apply(
+        xml, nomina.root_fragment, nomina.informacion_general_xml), rounds)
+    metadata = measure(lambda: nomina.metadata.post_apply(
+        xml, nomina.root_fragment, nomina.novedad, nomina.numero_secuencia_xml,
+        nomina.lugar_generacion_xml, nomina.proveedor_xml), rounds)
+    validate = measure(nomina.validate, rounds)
+
+    # campos del CUNE, uno a uno y en un solo recorrido
+    xpaths = [nomina.root_fragment.xpath_from_root(xpath) for xpath in CUNE_FIELDS]
+    one_by_one = measure(lambda: [xml.get_element_text_or_attribute(xpath) for xpath in xpaths], rounds)
+    single_pass = measure(lambda: xml.extract(xpaths), rounds)
+
+    print("%6d horas extras: CUNE %7.1f us  metadata %7.1f us  validate %7.1f us" % (
+        horas_extras, cune, metadata, validate))
+    print("%6d horas extras: %d campos uno a uno %7.1f us  un recorrido %7.1f us" % (
+        horas_extras, len(xpaths), one_by_one, single_pass))
+
+
+if __name__ == '__main__':
+    run(10, 2000)
+    run(1000, 2000)
+    run(10000, 500)
@@ -0,0 +1,60 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+fragmentos por segundo de FachoXML.fragment y memoria asignada
+por documento medida con tracemalloc.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from facho import fe
+from facho.fe.form_xml import DIANInvoiceXML
+
+import fixtures
+
+
+def run_fragments(count):
+    xml = fe.FeXML('Invoice', 'http://www.dian.gov.co/contratos/facturaelectronica/v1')
+    xml.fragment('./cac:InvoiceLine')
+    start = time.perf_counter()
+    for _ in range(count):
+        xml.fragment('./cac:InvoiceLine/cac:Item')
+    elapsed = time.perf_counter() - start
+    print("%6d fragments: %10.0f fragments/sec %6.2f us/fragment" % (
+        count, count / elapsed, elapsed * 1e6 / count))
+
+
+def allocations(build):
+    build()
+    tracemalloc.start()
+    document = build()
+    snapshot = tracemalloc.take_snapshot()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = snapshot.statistics('filename')
+    blocks = sum(stat.count for stat in stats)
+    size = sum(stat.size for stat in stats)
+    del document
+    return blocks, size, peak
+
+
+def run_allocations(name, build):
+    blocks, size, peak = allocations(build)
+    print("%-22s %8d blocks %8.1f KB retained %8.1f KB peak" % (
+        name, blocks, size / 1024, peak / 1024))
+
+
+if __name__ == '__main__':
+    run_fragments(10000)
+    run_fragments(100000)
+
+    inv = fixtures.invoice(100)
+    run_allocations('invoice 100 lines:', lambda: DIANInvoiceXML(inv))
+    run_allocations('nomina 10 horas extras:', lambda: fixtures.nomina(10).toFachoXML())
@@ -0,0 +1,30 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+documentos por segundo de DIANNominaXML.toFachoXML + tostring.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+
+def run(horas_extras, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fixtures.nomina(horas_extras).toFachoXML().tostring()
+    elapsed = time.perf_counter() - start
+
+    print("%4d horas extras x %4d docs: %8.1f docs/sec %8.2f ms/doc" % (
+        horas_extras, rounds, rounds / elapsed, elapsed * 1000 / rounds))
+
+
+if __name__ == '__main__':
+    run(1, 300)
+    run(100, 50)
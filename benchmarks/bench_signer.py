@@ -0,0 +1,73 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+firmas por segundo de DianXMLExtensionSigner con el certificado de pruebas.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+from facho import fe
+from facho.fe.form_xml import DIANInvoiceXML
+
+
+PKCS12 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'tests', 'example.p12')
+
+
+def invoice_xml(lines):
+    inv = fixtures.invoice(lines)
+    xml = DIANInvoiceXML(inv)
+    for extension in fixtures.extensions(inv):
+        xml.add_extension(extension)
+    return xml
+
+
+def document(lines):
+    return invoice_xml(lines).tostring(xml_declaration=True, encoding='UTF-8').encode('utf-8')
+
+
+def run(lines, rounds, verify_after_sign=True):
+    signer = fe.DianXMLExtensionSigner(PKCS12, verify_after_sign=verify_after_sign)
+    data = document(lines)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        signer.sign_xml_string(data)
+    elapsed = time.perf_counter() - start
+
+    print("%4d lineas x %4d firmas (verificar %5s): %8.1f firmas/sec %8.2f ms/firma" % (
+        lines, rounds, verify_after_sign, rounds / elapsed, elapsed * 1000 / rounds))
+
+
+def run_fachoxml(lines, rounds):
+    signer = fe.DianXMLExtensionSigner(PKCS12, verify_after_sign=False)
+    xml = invoice_xml(lines)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        signer.sign_xml_string(xml.tostring(xml_declaration=True, encoding='UTF-8').encode('utf-8'))
+    by_string = (time.perf_counter() - start) * 1000 / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        signer.sign_fachoxml(xml)
+    by_tree = (time.perf_counter() - start) * 1000 / rounds
+
+    print("%4d lineas: sign_xml_string %8.2f ms/firma sign_fachoxml %8.2f ms/firma" % (
+        lines, by_string, by_tree))
+
+
+if __name__ == '__main__':
+    for verify_after_sign in [True, 10, False]:
+        run(1, 200, verify_after_sign)
+        run(100, 50, verify_after_sign)
+    run_fachoxml(1, 200)
+    run_fachoxml(100, 50)
+    run_fachoxml(1000, 10)
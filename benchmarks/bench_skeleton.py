@@ -0,0 +1,37 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+tiempo de construccion por documento, solo el esqueleto
+y el documento completo.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from facho import fe
+from facho.fe.form_xml import DIANInvoiceXML
+
+import fixtures
+
+
+def run(name, build, rounds):
+    build()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        build()
+    elapsed = time.perf_counter() - start
+    print("%-28s %8.0f docs/sec %8.1f us/doc" % (
+        name, rounds / elapsed, elapsed * 1e6 / rounds))
+
+
+if __name__ == '__main__':
+    inv = fixtures.invoice(1)
+    run('invoice 1 line:', lambda: DIANInvoiceXML(inv), 2000)
+    run('nomina skeleton:', fe.nomina.DIANNominaIndividual, 5000)
+    run('nomina ajuste skeleton:', fe.nomina.DIANNominaIndividualDeAjuste.Reemplazar, 5000)
+    run('nomina 1 hora extra:', lambda: fixtures.nomina(1).toFachoXML(), 1000)
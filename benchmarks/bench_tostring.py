@@ -0,0 +1,43 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+tiempo y memoria pico de FachoXML.tostring sobre una factura grande.
+"""
+
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from facho.fe.form_xml import DIANInvoiceXML
+
+import fixtures
+
+
+def maxrss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(lines, rounds):
+    inv = fixtures.invoice(lines)
+    xml = DIANInvoiceXML(inv)
+    for extension in fixtures.extensions(inv):
+        xml.add_extension(extension)
+
+    before = maxrss_kb()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        document = xml.tostring()
+    elapsed = time.perf_counter() - start
+    after = maxrss_kb()
+
+    print("%5d lines: %8.2f ms/tostring %8d KB document %8d KB peak growth" % (
+        lines, elapsed * 1000 / rounds, len(document) / 1024, after - before))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, 10)
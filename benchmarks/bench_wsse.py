@@ -0,0 +1,82 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+sobres SOAP firmados por segundo con BinarySignature (WS-Security)
+usando la llave y certificado de pruebas.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import etree
+import xmlsec
+
+from facho.fe.client.wsse import signature
+from facho.fe.client.wsse.signature import BinarySignature
+
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests')
+
+ENVELOPE = '''<soap:Envelope xmlns:soap="http://www.w3.org/2003/05/soap-envelope" xmlns:wsa="http://www.w3.org/2005/08/addressing" xmlns:wcf="http://wcf.dian.colombia">
+  <soap:Header>
+    <wsa:Action>http://wcf.dian.colombia/IWcfDianCustomerServices/GetStatus</wsa:Action>
+    <wsa:To>https://vpfe-hab.dian.gov.co/WcfDianCustomerServices.svc</wsa:To>
+  </soap:Header>
+  <soap:Body>
+    <wcf:GetStatus><wcf:trackId>%d</wcf:trackId></wcf:GetStatus>
+  </soap:Body>
+</soap:Envelope>'''
+
+
+def envelope(i):
+    return etree.fromstring(ENVELOPE % (i))
+
+
+def signer():
+    return BinarySignature(
+        os.path.join(TESTS_DIR, 'example.key'),
+        os.path.join(TESTS_DIR, 'example.pem'),
+        signature_method=xmlsec.Transform.RSA_SHA256,
+        digest_method=xmlsec.Transform.SHA256)
+
+
+def run(rounds, shared):
+    shared_signer = signer()
+    start = time.perf_counter()
+    for i in range(rounds):
+        # antes DianSignatureClient creaba un BinarySignature por peticion
+        wsse = shared_signer if shared else signer()
+        wsse.apply(envelope(i), {})
+    elapsed = time.perf_counter() - start
+    print("%-22s %4d envelopes %.3fs %.1f envelopes/s" % (
+        'shared signer' if shared else 'signer per request', rounds, elapsed, rounds / elapsed))
+
+
+def run_key(rounds):
+    key_file = os.path.join(TESTS_DIR, 'example.key')
+    certfile = os.path.join(TESTS_DIR, 'example.pem')
+    key_data = open(key_file, 'rb').read()
+    cert_data = open(certfile, 'rb').read()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        signature._make_sign_key(key_data, cert_data, None)
+    parsed = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        signature.load_sign_key(key_file, certfile)
+    cached = (time.perf_counter() - start) / rounds
+    print("signing key: parse PEM %.3f ms cached %.3f ms" % (parsed * 1000, cached * 1000))
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    run_key(rounds * 10)
+    signer().apply(envelope(0), {})
+    run(rounds, shared=False)
+    run(rounds, shared=True)
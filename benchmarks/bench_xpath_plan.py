@@ -0,0 +1,38 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+elementos por segundo creados via FachoXML.set_element
+al construir DIANInvoiceXML.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from facho.fe.form_xml import DIANInvoiceXML
+
+import fixtures
+
+
+def run(lines, rounds):
+    inv = fixtures.invoice(lines)
+
+    elements = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        xml = DIANInvoiceXML(inv)
+        elements += sum(1 for _ in xml.root.iter())
+    elapsed = time.perf_counter() - start
+
+    print("%5d lines x %3d docs: %10.0f elements/sec %8.2f ms/doc" % (
+        lines, rounds, elements / elapsed, elapsed * 1000 / rounds))
+
+
+if __name__ == '__main__':
+    run(1, 200)
+    run(100, 20)
+    run(500, 5)
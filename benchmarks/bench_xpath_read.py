@@ -0,0 +1,42 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+lecturas por segundo via FachoXML (validate de nomina, CUNE)
+y uso de la cache de XPath compilados.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from facho import facho
+
+import fixtures
+
+
+def run(name, call, rounds):
+    call()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        call()
+    elapsed = time.perf_counter() - start
+    print("%-24s %8.0f calls/sec %8.1f us/call" % (
+        name, rounds / elapsed, elapsed * 1e6 / rounds))
+
+
+if __name__ == '__main__':
+    nomina = fixtures.nomina(10)
+    xml = nomina.toFachoXML()
+    information = nomina.informacion_general
+
+    run('nomina validate:', nomina.validate, 2000)
+    run('nomina CUNE:', lambda: information.post_apply(xml, nomina.root_fragment, nomina.informacion_general_xml), 2000)
+    run('get_element_text:', lambda: xml.get_element_text(xml.xpath_from_root('/DevengadosTotal')), 20000)
+
+    cache_info = getattr(facho, 'xpath_cache_info', None)
+    if cache_info is not None:
+        print(cache_info())
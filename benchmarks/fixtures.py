@@ -0,0 +1,163 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+documentos de ejemplo para las mediciones de rendimiento.
+"""
+
+from datetime import datetime
+
+import facho.fe.form as form
+from facho import fe
+
+
+ISSUE = datetime(2021, 5, 3, 10, 11, 12)
+
+
+def party(name):
+    return form.Party(
+        name=name,
+        legal_name=name,
+        email='facho@example.org',
+        ident=form.PartyIdentification('900579212', '5', '31'),
+        responsability_code=form.Responsability(['O-07']),
+        responsability_regime_code='48',
+        organization_code='1',
+        address=form.Address(
+            '', 'calle facho', form.City('05001', 'Medellín'),
+            form.Country('CO', 'Colombia'),
+            form.CountrySubentity('05', 'Antioquia'))
+    )
+
+
+def invoice(lines=100):
+    inv = form.NationalSalesInvoice()
+    inv.set_period(ISSUE, ISSUE)
+    inv.set_issue(ISSUE)
+    inv.set_ident('SETP990000001')
+    inv.set_operation_type('10')
+    inv.set_payment_mean(form.PaymentMean(form.PaymentMean.DEBIT, '41', ISSUE, '1234'))
+    inv.set_supplier(party('facho-supplier'))
+    inv.set_customer(party('facho-customer'))
+    for index in range(lines):
+        inv.add_invoice_line(form.InvoiceLine(
+            quantity=form.Quantity(1, '94'),
+            description='producto facho %d' % (index),
+            item=form.StandardItem(9999),
+            price=form.Price(form.Amount(100.0), '01', ''),
+            tax=form.TaxTotal(subtotals=[form.TaxSubTotal(percent=19.0)])
+        ))
+    inv.calculate()
+    return inv
+
+
+def extensions(inv):
+    return [
+        fe.DianXMLExtensionSoftwareSecurityCode('id software', '12345', inv.invoice_ident),
+        fe.DianXMLExtensionAuthorizationProvider(),
+        fe.DianXMLExtensionCUFE(inv, clave_tecnica='clave tecnica'),
+        fe.DianXMLExtensionSoftwareProvider('900579212', '5', 'id software'),
+        fe.DianXMLExtensionInvoiceAuthorization('18760000001', ISSUE, ISSUE,
+                                                'SETP', 990000000, 995000000),
+    ]
+
+
+def hora_extra(index):
+    return fe.nomina.DevengadoHoraExtra(
+        hora_inicio='2021-11-30T19:09:55',
+        hora_fin='2021-11-30T20:09:55',
+        cantidad=index,
+        porcentaje=fe.nomina.Amount(1),
+        pago=fe.nomina.Amount(100)
+    )
+
+
+def nomina(horas_extras=10):
+    nomina = fe.nomina.DIANNominaIndividual()
+
+    nomina.asignar_metadata(fe.nomina.Metadata(
+        novedad=fe.nomina.Novedad(activa=True, cune='N0111'),
+        secuencia=fe.nomina.NumeroSecuencia(prefijo='N', consecutivo='00001'),
+        lugar_generacion=fe.nomina.Lugar(
+            pais=fe.nomina.Pais(code='CO'),
+            departamento=fe.nomina.Departamento(code='05'),
+            municipio=fe.nomina.Municipio(code='05001'),
+        ),
+        proveedor=fe.nomina.Proveedor(
+            nit='999999', dv=2, software_id='xx',
+            software_pin='12', razon_social='facho')
+    ))
+
+    nomina.asignar_informacion_general(fe.nomina.InformacionGeneral(
+        fecha_generacion='2020-01-16',
+        hora_generacion='10:53:10-05:00',
+        tipo_ambiente=fe.nomina.InformacionGeneral.AMBIENTE_PRUEBAS,
+        software_pin='693',
+        tipo_xml=fe.nomina.InformacionGeneral.TIPO_XML_NORMAL,
+        periodo_nomina=fe.nomina.PeriodoNomina(code='1'),
+        tipo_moneda=fe.nomina.TipoMoneda(code='COP')
+    ))
+
+    nomina.asignar_periodo(fe.nomina.Periodo(
+        fecha_ingreso='2020-01-01',
+        fecha_liquidacion_inicio='2020-01-01',
+        fecha_liquidacion_fin='2020-01-30',
+        fecha_generacion='2020-01-30',
+    ))
+
+    nomina.asignar_pago(fe.nomina.Pago(
+        forma=fe.nomina.FormaPago(code='1'),
+        metodo=fe.nomina.MetodoPago(code='10')
+    ))
+
+    nomina.asignar_empleador(fe.nomina.Empleador(
+        razon_social='facho', nit='700085371', dv='1',
+        pais=fe.nomina.Pais(code='CO'),
+        departamento=fe.nomina.Departamento(code='05'),
+        municipio=fe.nomina.Municipio(code='05001'),
+        direccion='calle etrivial'
+    ))
+
+    nomina.asignar_trabajador(fe.nomina.Trabajador(
+        tipo_contrato=fe.nomina.TipoContrato(code='1'),
+        alto_riesgo=False,
+        tipo_documento=fe.nomina.TipoDocumento(code='11'),
+        primer_apellido='gnu',
+        segundo_apellido='emacs',
+        primer_nombre='facho',
+        lugar_trabajo=fe.nomina.LugarTrabajo(
+            pais=fe.nomina.Pais(code='CO'),
+            departamento=fe.nomina.Departamento(code='05'),
+            municipio=fe.nomina.Municipio(code='05001'),
+            direccion='calle facho'
+        ),
+        numero_documento='800199436',
+        tipo=fe.nomina.TipoTrabajador(code='01'),
+        salario_integral=True,
+        sueldo=fe.nomina.Amount(1_500_000)
+    ))
+
+    nomina.adicionar_devengado(fe.nomina.DevengadoBasico(
+        dias_trabajados=30,
+        sueldo_trabajado=fe.nomina.Amount(1_500_000)
+    ))
+
+    nomina.adicionar_devengado(fe.nomina.DevengadoHorasExtrasDiarias(
+        horas_extras=[hora_extra(index) for index in range(horas_extras)]
+    ))
+
+    nomina.adicionar_devengado(fe.nomina.DevengadoHorasExtrasNocturnas(
+        horas_extras=[hora_extra(index) for index in range(horas_extras)]
+    ))
+
+    nomina.adicionar_deduccion(fe.nomina.DeduccionSalud(
+        porcentaje=fe.nomina.Amount(4),
+        deduccion=fe.nomina.Amount(60_000)
+    ))
+
+    nomina.adicionar_deduccion(fe.nomina.DeduccionFondoPension(
+        porcentaje=fe.nomina.Amount(4),
+        deduccion=fe.nomina.Amount(60_000)
+    ))
+
+    return nomina
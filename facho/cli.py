@@ -190,13 +190,9 @@ def validate_invoice(invoice_path):
     warnings.warn("!! NO APROBADO FUNCIONAMIENTO")
 
     from facho.fe.data.dian import XSD
+    from facho.fe.validation import schema_namespace
     content = open(invoice_path, 'r').read()
-    # TODO donde ubicar esta responsabilidad?
-    # esto es requerido por el XSD de la DIAN
-    content = content.replace(
-        'xmlns:fe="http://www.dian.gov.co/contratos/facturaelectronica/v1"',
-        'xmlns:fe="urn:oasis:names:specification:ubl:schema:xsd:Invoice-2"'
-    )
+    content = schema_namespace(content, 'Invoice')
     XSD.validate(content, XSD.UBLInvoice)
 
 
@@ -204,14 +200,36 @@ def validate_invoice(invoice_path):
 @click.argument('nomina_path')
 def validate_nominaindividual(nomina_path):
     from facho.fe.data.dian import XSD
+    from facho.fe.validation import schema_namespace
     content = open(nomina_path, 'r').read()
-    content = content.replace(
-        'xmlns="http://www.dian.gov.co/contratos/facturaelectronica/v1"',
-        'xmlns="dian:gov:co:facturaelectronica:NominaIndividual"',
-    )
+    content = schema_namespace(content, 'NominaIndividual')
     XSD.validate(content, XSD.NominaIndividual)
 
 
+@click.command()
+@click.option('--processes', type=int, default=None)
+@click.option('--engine', type=click.Choice(['lxml', 'xmlschema']), default='lxml')
+@click.option('--detailed/--no-detailed', default=True,
+              help='con lxml, detallar errores usando xmlschema')
+@click.option('--output', type=click.File('w'), default='-')
+@click.argument('path', type=click.Path(exists=True))
+def validate_batch(path, processes=None, engine='lxml', detailed=True, output=None):
+    """
+    valida contra el XSD los .xml de un directorio o archivo ZIP,
+    el reporte se emite en JSON.
+    """
+    import json
+    from facho.fe import validation
+
+    results = validation.validate_path(path, processes=processes,
+                                       engine=engine, detailed=detailed)
+    report = validation.report(results)
+    json.dump(report, output, indent=2, ensure_ascii=False)
+    output.write('\n')
+    if report['invalid']:
+        sys.exit(1)
+
+
 @click.command()
 @click.option('--private-key', type=click.Path(exists=True))
 @click.option('--passphrase')
@@ -283,6 +301,48 @@ def generate_invoice(private_key, passphrase, scriptname, generate=False, ssl=Tr
         else:
             DIANWrite(xml, output)
 
+@click.command()
+@click.option('--private-key', type=click.Path(exists=True))
+@click.option('--passphrase')
+@click.option('--ssl/--no-ssl', default=False)
+@click.option('--sign/--no-sign', default=False)
+@click.option('--use-cache-policy/--no-use-cache-policy', default=False)
+@click.option('--processes', type=int, default=None)
+@click.argument('scriptname', type=click.Path(exists=True), required=True)
+@click.argument('specs', type=click.File('r'), required=True)
+@click.argument('output_dir', required=True)
+def generate_invoices(private_key, passphrase, scriptname, specs, output_dir, ssl=True, sign=False, use_cache_policy=False, processes=None):
+    """
+    genera facturas en lote.
+    SCRIPTNAME espera
+     def invoice(spec: dict) -> form.Invoice
+     def extensions(form.Invoice): -> List[facho.FachoXMLExtension]
+    SPECS archivo JSONL con una especificacion por linea, - para stdin.
+    """
+
+    if not ssl:
+        disable_ssl()
+
+    from facho import fe
+    from facho.fe import batch
+
+    signer = None
+    if sign:
+        signer = fe.DianXMLExtensionSigner(private_key, passphrase=passphrase, localpolicy=use_cache_policy)
+
+    generator = batch.InvoiceBatch(batch.ScriptInvoiceBuilder(scriptname),
+                                   output_dir,
+                                   signer=signer,
+                                   processes=processes)
+    for result in generator.run(batch.read_specs(specs)):
+        if not result.ok:
+            print("-ERROR spec %d" % (result.index), file=sys.stderr)
+            print(result.error, file=sys.stderr)
+
+    print(generator.report)
+    if generator.report.failed:
+        sys.exit(1)
+
 @click.command()
 @click.option('--private-key', type=click.Path(exists=True))
 @click.option('--passphrase')
@@ -385,6 +445,31 @@ def generate_nomina_habilitacion(software_id, software_pin, nit, dv, output_zipp
     )
     generador.generar(output_zippath)
 
+@click.command()
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', type=int, default=8080)
+@click.option('--latency', type=float, default=0.0, help='segundos por peticion')
+@click.option('--error-rate', type=float, default=0.0, help='fraccion de peticiones con Fault')
+@click.option('--polls-in-process', type=int, default=0,
+              help='consultas de GetStatusZip que responden en proceso')
+@click.option('--cert', type=click.Path(exists=True), help='certificado PEM para verificar WS-Security')
+def dian_stub(host, port, latency=0.0, error_rate=0.0, polls_in_process=0, cert=None):
+    """
+    servidor SOAP local que imita los servicios de la DIAN.
+    """
+    from facho.fe.client.stub import DianStub
+
+    stub = DianStub(host, port, latency=latency, error_rate=error_rate,
+                    certfile=cert, polls_in_process=polls_in_process)
+    print("WSDL: %s" % (stub.wsdl))
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
 @click.group()
 def main():
     pass
@@ -397,10 +482,13 @@ main.add_command(soap_get_status)
 main.add_command(soap_get_status_zip)
 main.add_command(soap_get_numbering_range)
 main.add_command(generate_invoice)
+main.add_command(generate_invoices)
 main.add_command(validate_invoice)
 main.add_command(sign_xml)
 main.add_command(sign_verify_xml)
 main.add_command(generate_nomina)
 main.add_command(soap_send_nomina_sync)
 main.add_command(validate_nominaindividual)
+main.add_command(validate_batch)
+main.add_command(dian_stub)
 main.add_command(generate_nomina_habilitacion)
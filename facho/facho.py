@@ -4,10 +4,158 @@
 from lxml import etree
 from lxml.etree import Element, SubElement, tostring
 import re
-from collections import defaultdict
-from copy import deepcopy
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from copy import copy, deepcopy
+from functools import lru_cache
 from pprint import pprint
 
+# plan precompilado de una ruta xpath
+#  * root: etiqueta raiz esperada o None si la ruta es relativa
+#  * steps: tupla de XPathStep, el ultimo es el elemento objetivo
+#  * prefixes: ruta relativa hasta cada paso, llave del indice de prefijos
+XPathPlan = namedtuple('XPathPlan', ['root', 'steps', 'prefixes'])
+
+# paso de un plan
+#  * path: ruta para buscar el hijo (notacion Clark si aplica)
+#  * tag: etiqueta a crear
+#  * attrs: atributos a asignar al crear
+#  * sibling_tag: expresion original usada para ubicar primos al adicionar
+XPathStep = namedtuple('XPathStep', ['path', 'tag', 'attrs', 'sibling_tag'])
+
+# cache LRU por proceso de XPath compilados para las lecturas
+# y de planes para la creacion, llave (expresion, nsmap)
+XPATH_CACHE_SIZE = 1024
+
+# estadisticas de ambas caches, ver functools.lru_cache
+XPathCacheInfo = namedtuple('XPathCacheInfo', ['compiled', 'plans'])
+
+
+@lru_cache(maxsize=XPATH_CACHE_SIZE)
+def _compiled_xpath(xpath, nsmap_key):
+    namespaces = None
+    if nsmap_key:
+        namespaces = dict(nsmap_key)
+    return etree.XPath(xpath, namespaces=namespaces)
+
+
+@lru_cache(maxsize=XPATH_CACHE_SIZE)
+def _xpath_plan(xpath, nsmap_key):
+    nsmap = None
+    if nsmap_key:
+        nsmap = dict(nsmap_key)
+    return LXMLBuilder(nsmap)._build_xpath_plan(xpath)
+
+
+def xpath_cache_info():
+    """
+    retorna XPathCacheInfo con aciertos y fallos de la cache
+    de XPath compilados y de la cache de planes.
+    """
+    return XPathCacheInfo(_compiled_xpath.cache_info(), _xpath_plan.cache_info())
+
+
+class ExtractionPlan:
+    """
+    ubica el primer elemento de varias rutas xpath en un solo
+    recorrido del documento.
+
+    solo se recorren rutas simples de etiquetas (ej: /a/b, ./a/b),
+    las demas (predicados, comodines, '..', funciones) se evaluan
+    con xpath.
+    """
+
+    _re_step = re.compile(r'^(?:(?P<ns>\w+):)?(?P<tag>[A-Za-z_][\w.-]*)$')
+
+    def __init__(self, xpaths, nsmap=None):
+        self.xpaths = tuple(xpaths)
+        self.fallback = []
+        # arbol de pasos: etiqueta -> (indices de rutas que terminan, subarbol)
+        self.absolute = {}
+        self.relative = {}
+
+        for index, xpath in enumerate(self.xpaths):
+            compiled = self._compile(xpath, nsmap)
+            if compiled is None:
+                self.fallback.append(index)
+                continue
+
+            tree, tags = compiled
+            for tag in tags[:-1]:
+                tree = tree.setdefault(tag, ([], {}))[1]
+            tree.setdefault(tags[-1], ([], {}))[0].append(index)
+
+    def _compile(self, xpath, nsmap):
+        if xpath.startswith('./'):
+            tree = self.relative
+            steps = xpath[2:].split('/')
+        elif xpath.startswith('/') and not xpath.startswith('//'):
+            tree = self.absolute
+            steps = xpath[1:].split('/')
+        else:
+            return None
+
+        tags = []
+        for step in steps:
+            match = self._re_step.match(step)
+            if match is None:
+                return None
+            ns, tag = match.group('ns', 'tag')
+            if ns:
+                if not nsmap or ns not in nsmap:
+                    return None
+                tag = '{%s}%s' % (nsmap[ns], tag)
+            tags.append(tag)
+        return tree, tags
+
+    def find(self, root, evaluate):
+        """
+        retorna lista con el primer elemento de cada ruta o None.
+
+        @param root elemento de contexto, las rutas absolutas
+        parten de la raiz del documento
+        @param evaluate callback(xpath) para las rutas no simples
+        """
+        found = [None] * len(self.xpaths)
+
+        if self.relative:
+            self._walk(root, self.relative, found)
+
+        if self.absolute:
+            document_root = root.getroottree().getroot()
+            branch = self.absolute.get(document_root.tag)
+            if branch is not None:
+                indices, tree = branch
+                for index in indices:
+                    found[index] = document_root
+                self._walk(document_root, tree, found)
+
+        for index in self.fallback:
+            found[index] = evaluate(self.xpaths[index])
+        return found
+
+    def _walk(self, elem, tree, found):
+        # en orden de documento, se conserva el primero como xpath()[0]
+        for child in elem:
+            branch = tree.get(child.tag)
+            if branch is None:
+                continue
+            indices, children = branch
+            for index in indices:
+                if found[index] is None:
+                    found[index] = child
+            if children:
+                self._walk(child, children, found)
+
+
+@lru_cache(maxsize=256)
+def _extraction_plan(xpaths, nsmap_key):
+    nsmap = None
+    if nsmap_key:
+        nsmap = dict(nsmap_key)
+    return ExtractionPlan(xpaths, nsmap)
+
+
 class FachoValueInvalid(Exception):
     def __init__(self, xpath):
         super().__init__('FachoValueInvalid invalid xpath %s' % (xpath))
@@ -30,10 +178,15 @@ class LXMLBuilder:
     #   * busquedad
     #   * comparacion
 
+    # compiladas una sola vez por proceso
+    _re_node_expr = re.compile(r'^(?P<path>((?P<ns>\w+):)?(?P<tag>[a-zA-Z0-9_-]+))(?P<attrs>\[.+\])?')
+    _re_attrs = re.compile(r'(\w+)\s*=\s*\"?(\w+)\"?')
+
     def __init__(self, nsmap):
         self.nsmap = nsmap
-        self._re_node_expr = re.compile(r'^(?P<path>((?P<ns>\w+):)?(?P<tag>[a-zA-Z0-9_-]+))(?P<attrs>\[.+\])?')
-        self._re_attrs = re.compile(r'(\w+)\s*=\s*\"?(\w+)\"?')
+        self._nsmap_key = None
+        if nsmap:
+            self._nsmap_key = tuple(sorted(nsmap.items()))
 
     def match_expression(self, node_expr):
         match = re.search(self._re_node_expr, node_expr)
@@ -73,6 +226,42 @@ class LXMLBuilder:
 
         return Element(expr['tag'], **attrs)
 
+    def compile_xpath(self, xpath):
+        """
+        retorna XPathPlan de xpath, el plan se comparte
+        entre todos los documentos con el mismo nsmap.
+        """
+        return _xpath_plan(xpath, self._nsmap_key)
+
+    def _build_xpath_plan(self, xpath):
+        node_paths = xpath.split('/')
+        node_paths.pop(0) #remove empty /
+        root_tag = node_paths.pop(0)
+
+        root = None
+        if xpath.startswith('.'):
+            node_paths.insert(0, root_tag)
+        else:
+            root = self.build_from_expression(root_tag).tag
+
+        steps = []
+        for node_path in node_paths:
+            expr = self.match_expression(node_path)
+            node = self.build_from_expression(node_path)
+            path = expr['path']
+            if expr['ns'] and self.nsmap:
+                path = node.tag
+            steps.append(XPathStep(path, node.tag, dict(node.attrib), node_path))
+
+        prefixes = []
+        for index in range(len(node_paths)):
+            prefixes.append('/'.join(node_paths[:index + 1]))
+
+        return XPathPlan(root, tuple(steps), tuple(prefixes))
+
+    def build_from_step(self, step):
+        return Element(step.tag, step.attrs)
+
     def _normalize_tag(self, tag):
         return re.sub(r'^(\{.+\}|.+:)', '', tag)
 
@@ -99,7 +288,7 @@ class LXMLBuilder:
         elem.text = text
 
     def xpath(self, elem, xpath, multiple=False):
-        elems = elem.xpath(xpath, namespaces=self.nsmap)
+        elems = _compiled_xpath(xpath, self._nsmap_key)(elem)
         if elems:
             if multiple:
                 return elems
@@ -132,27 +321,46 @@ class LXMLBuilder:
                 pass
 
     @classmethod
-    def tostring(self, oelem, **attrs):
-        elem = deepcopy(oelem)
+    @contextmanager
+    def _without_optionals(cls, elem, optionals):
+        """
+        retira temporalmente del arbol los elementos opcionales
+        no poblados, al salir se restauran.
+        """
+        detached = []
+        try:
+            for el in optionals:
+                parent = el.getparent()
+                if len(el) == 0 and len(el.attrib) == 0 and parent is not None:
+                    detached.append((parent, parent.index(el), el))
+                    parent.remove(el)
+            yield elem
+        finally:
+            for parent, index, el in reversed(detached):
+                parent.insert(index, el)
 
+    @classmethod
+    def tostring(cls, elem, optionals=(), **attrs):
         attrs['pretty_print'] = attrs.pop('pretty_print', False)
         attrs['encoding'] = attrs.pop('encoding', 'UTF-8')
 
-        for el in elem.getiterator():
-            keys = filter(lambda key: key.startswith('facho_'), el.keys())
-            self.remove_attributes(el, keys, exclude=['facho_optional'])
+        with cls._without_optionals(elem, optionals):
+            return tostring(elem, **attrs).decode('utf-8')
 
-            is_optional = el.get('facho_optional', 'False') == 'True'
-            if is_optional and el.getchildren() == [] and el.keys() == ['facho_optional']:
-                el.getparent().remove(el)
 
-        return tostring(elem, **attrs).decode('utf-8')
+def _valid_always(content, attrs):
+    return True
 
 
 class FachoXML:
     """
     Decora XML con funciones de consulta XPATH de un solo elemento
     """
+
+    __slots__ = ('builder', 'nsmap', 'root', 'fragment_root_element', 'fragment_prefix',
+                 'xpath_for', 'extensions', '_validators',
+                 '_prefix_index', '_placeholders', '_append_cursor')
+
     def __init__(self, root, builder=None, nsmap=None, fragment_prefix='',fragment_root_element=None):
         if builder is None:
             self.builder = LXMLBuilder(nsmap)
@@ -170,7 +378,16 @@ class FachoXML:
         self.fragment_prefix = fragment_prefix
         self.xpath_for = {}
         self.extensions = []
-        self._validators = defaultdict(lambda: lambda v, attrs: True)
+        self._validators = defaultdict(lambda: _valid_always)
+        # indice (raiz, prefijo xpath) -> elemento, compartido
+        # entre el documento y sus fragmentos
+        self._prefix_index = {}
+        # placeholders aun no poblados elemento -> opcional,
+        # compartido entre el documento y sus fragmentos
+        self._placeholders = {}
+        # cursor de adicion (padre, etiqueta) -> (ultimo primo, ultimo
+        # hijo revisado), compartido entre el documento y sus fragmentos
+        self._append_cursor = {}
 
     @classmethod
     def from_string(cls, document: str, namespaces: dict() = []) -> 'FachoXML':
@@ -197,7 +414,61 @@ class FachoXML:
 
         if parent is None:
             parent = self.find_or_create_element(xpath, append=append)
-        return FachoXML(parent, nsmap=self.nsmap, fragment_prefix=root_prefix, fragment_root_element=self.root)
+        return self._view(parent, root_prefix)
+
+    def _view(self, root, fragment_prefix):
+        """
+        retorna un fragmento con raiz en root, es una vista del
+        documento: comparte builder, alias, validadores e indices.
+        """
+        fragment = FachoXML.__new__(FachoXML)
+        fragment.builder = self.builder
+        fragment.nsmap = self.nsmap
+        fragment.root = root
+        fragment.fragment_root_element = self.root
+        fragment.fragment_prefix = fragment_prefix
+        fragment.xpath_for = self.xpath_for
+        fragment.extensions = self.extensions
+        fragment._validators = self._validators
+        fragment._prefix_index = self._prefix_index
+        fragment._placeholders = self._placeholders
+        fragment._append_cursor = self._append_cursor
+        return fragment
+
+    def clone(self, target=None):
+        """
+        copia el documento junto con sus placeholders e indices,
+        copiar un esqueleto ya construido es mas economico que
+        crearlo de nuevo por rutas xpath.
+
+        @param target instancia a inicializar con la copia, por omision
+        una nueva del mismo tipo
+        @return target
+        """
+        if target is None:
+            target = type(self).__new__(type(self))
+
+        root = deepcopy(self.root)
+        # deepcopy conserva el orden de los elementos
+        elements = dict(zip(self.root.iter(), root.iter()))
+
+        target.builder = self.builder
+        target.nsmap = self.nsmap
+        target.root = root
+        target.fragment_root_element = elements.get(self.fragment_root_element, self.fragment_root_element)
+        target.fragment_prefix = self.fragment_prefix
+        target.xpath_for = dict(self.xpath_for)
+        target.extensions = list(self.extensions)
+        target._validators = copy(self._validators)
+        target._prefix_index = {}
+        for (prefix_root, prefix), elem in self._prefix_index.items():
+            if prefix_root in elements and elem in elements:
+                target._prefix_index[(elements[prefix_root], prefix)] = elements[elem]
+        target._placeholders = {elements[elem]: optional
+                                for elem, optional in self._placeholders.items()
+                                if elem in elements}
+        target._append_cursor = {}
+        return target
 
     def register_alias_xpath(self, alias, xpath):
         self.xpath_for[alias] = xpath
@@ -215,16 +486,21 @@ class FachoXML:
 
     def placeholder_for(self, xpath, append=False, optional=False):
         elem = self.find_or_create_element(xpath, append)
-        if optional:
-            elem.set('facho_optional', 'True')
-        elem.set('facho_placeholder', 'True')
+        self._placeholders[elem] = optional or self._placeholders.get(elem, False)
         return elem
 
     def replacement_for(self, xpath, new_xpath, content, **attrs):
         elem = self.get_element(xpath)
-        self.builder.remove(elem)
+        self.remove_element(elem)
         return self.set_element(new_xpath, content, **attrs)
 
+    def remove_element(self, elem):
+        self.builder.remove(elem)
+        self._prefix_index.clear()
+        self._append_cursor.clear()
+        for el in elem.iter():
+            self._placeholders.pop(el, None)
+
     def find_or_create_element(self, xpath, append=False):
         """
         @param xpath ruta xpath para crear o consultar de un solo elemendo
@@ -232,73 +508,115 @@ class FachoXML:
         @return elemento segun self.builder
         """
         xpath = self._path_xpath_for(xpath)
-        node_paths = xpath.split('/')
-        node_paths.pop(0) #remove empty /
-        root_tag = node_paths.pop(0)
+        plan = self.builder.compile_xpath(xpath)
 
-        root_node = self.builder.build_from_expression(root_tag)
-        if xpath.startswith('.'):
-            # restaurar ya que no es la raiz y asignar actual como raiz
-            node_paths.insert(0, root_tag)
-            root_node = self.root
-            
-        if not self.builder.same_tag(root_node.tag, self.root.tag):
-            
+        if plan.root is not None and not self.builder.same_tag(plan.root, self.root.tag):
             raise ValueError('xpath %s must be absolute to /%s' % (xpath, self.root.tag))
 
-        # crea jerarquia segun xpath indicado
-        parent = None
-        current_elem = self.root
-        node_tag = node_paths.pop(-1)
+        *node_steps, node_step = plan.steps
+        current_elem, depth = self._lookup_prefix(plan, len(node_steps))
 
-        for node_path in node_paths:
-            node_expr = self.builder.match_expression(node_path)
-            node = self.builder.build_from_expression(node_path)
-
-            child = self.builder.find_relative(current_elem, node_expr['path'], self.nsmap)
+        # crea jerarquia segun xpath indicado
+        for index in range(depth, len(node_steps)):
+            step = node_steps[index]
+            child = self.builder.find_relative(current_elem, step.path, self.nsmap)
 
-            parent = current_elem
             if child is not None:
                 current_elem = child
             else:
+                node = self.builder.build_from_step(step)
                 self.builder.append(current_elem, node)
                 current_elem = node
+            self._prefix_index[(self.root, plan.prefixes[index])] = current_elem
 
-        node_expr = self.builder.match_expression(node_tag)
-        node = self.builder.build_from_expression(node_tag)
-        child = self.builder.find_relative(current_elem, node_expr['path'], self.nsmap)
         parent = current_elem
-        if child is not None:
-            current_elem = child
-           
-        if parent == current_elem:
+        node_key = (self.root, plan.prefixes[-1])
+        child = self._prefix_index.get(node_key)
+        if child is not None and child.getparent() is not parent:
+            # el elemento fue removido fuera de remove_element
+            del self._prefix_index[node_key]
+            child = None
+        if child is None:
+            child = self.builder.find_relative(parent, node_step.path, self.nsmap)
+
+        if child is None:
+            node = self.builder.build_from_step(node_step)
             self.builder.append(parent, node)
+            self._prefix_index[node_key] = node
             return node
 
         # se fuerza la adicion como un nuevo elemento
         if append:
-            last_slibing = None
-            for child in parent.getchildren():
-                if child.tag == node_tag:
-                    last_slibing = child
+            node_tag = node_step.sibling_tag
+            last_slibing, scanned = self._append_cursor_for(parent, node_tag)
 
+            node = self.builder.build_from_step(node_step)
             # si no ahi primos se adiciona como hijo
             if last_slibing is None:
                 self.builder.append(parent, node)
                 return node
 
-            if self.builder.is_attribute(last_slibing, 'facho_placeholder', 'True'):
-                self._remove_facho_attributes(last_slibing)
-                return last_slibing 
+            if last_slibing in self._placeholders:
+                self._populated(last_slibing)
+                return last_slibing
             self.builder.append_next(last_slibing, node)
+            # el nuevo primo puede quedar antes del ultimo hijo revisado
+            if node.tag == node_tag:
+                self._append_cursor[(parent, node_tag)] = (node, scanned)
             return node
 
-        if child is None:
-            self.builder.append(current_elem, node)
-            return node
+        self._prefix_index[node_key] = child
+        self._populated(child)
+        return child
+
+    def _append_cursor_for(self, parent, node_tag):
+        """
+        retorna el ultimo primo con etiqueta node_tag y el ultimo
+        hijo revisado, solo se revisan los hijos adicionados
+        desde la consulta anterior.
+        """
+        key = (parent, node_tag)
+        last_slibing, scanned = self._append_cursor.get(key, (None, None))
+        if scanned is None or scanned.getparent() is not parent \
+           or (last_slibing is not None and last_slibing.getparent() is not parent):
+            last_slibing = None
+            children = parent.iterchildren()
+        else:
+            children = scanned.itersiblings()
+
+        for child in children:
+            scanned = child
+            if child.tag == node_tag:
+                last_slibing = child
 
-        self._remove_facho_attributes(current_elem)
-        return current_elem
+        self._append_cursor[key] = (last_slibing, scanned)
+        return last_slibing, scanned
+
+    def _lookup_prefix(self, plan, depth):
+        """
+        retorna el elemento del prefijo conocido mas largo
+        y la cantidad de pasos que resuelve.
+        """
+        for index in range(depth - 1, -1, -1):
+            key = (self.root, plan.prefixes[index])
+            elem = self._prefix_index.get(key)
+            if elem is None:
+                continue
+            if self._attached(elem, index + 1):
+                return elem, index + 1
+            del self._prefix_index[key]
+        return self.root, 0
+
+    def _attached(self, elem, depth):
+        """
+        True si elem sigue colgando de self.root a depth niveles,
+        el arbol se puede modificar directamente con lxml.
+        """
+        for _ in range(depth):
+            elem = elem.getparent()
+            if elem is None:
+                return False
+        return elem is self.root
 
     def set_element_validator(self, xpath, validator = False):
         """
@@ -310,7 +628,7 @@ class FachoXML:
 
         key = self._path_xpath_for(xpath)
         if not validator:
-            self._validators[key] = lambda v, attrs: True
+            self._validators[key] = _valid_always
         else:
             self._validators[key] = validator
         
@@ -428,37 +746,95 @@ class FachoXML:
         returna el contenido o attributos de un conjunto de XPATHS
         si algun XPATH es una tupla se retorna el primer elemento del mismo.
         """
+        values = self.extract([xpath for xpath in xpaths if not isinstance(xpath, tuple)],
+                              raise_on_fail=raise_on_fail)
         vals = []
         for xpath in xpaths:
             if isinstance(xpath, tuple):
-                val = xpath[0]
+                vals.append(xpath[0])
             else:
-                val = self.get_element_text_or_attribute(xpath, raise_on_fail=raise_on_fail)
-            vals.append(val)
+                vals.append(values[xpath])
         return vals
 
+    def find_elements(self, xpaths):
+        """
+        retorna lista con el primer elemento de cada XPATH o None,
+        las rutas simples se ubican en un solo recorrido, ver ExtractionPlan.
+        """
+        return self._find_elements([self.fragment_prefix + self._path_xpath_for(xpath)
+                                    for xpath in xpaths])
+
+    def _find_elements(self, xpaths):
+        plan = _extraction_plan(tuple(xpaths), self.builder._nsmap_key)
+        return plan.find(self.root, lambda xpath: self.builder.xpath(self.root, xpath))
+
+    def extract(self, xpaths, raise_on_fail=False):
+        """
+        retorna dict XPATH -> contenido, o atributo si termina en @atributo,
+        None si no existe. los elementos se ubican en un solo recorrido.
+
+        @param raise_on_fail ValueError si no existe el elemento,
+        KeyError si no existe el atributo
+        """
+        attributes = []
+        paths = []
+        for xpath in xpaths:
+            parts = xpath.split('/')
+            if parts[-1].startswith('@'):
+                attributes.append(parts.pop(-1).lstrip('@'))
+                paths.append(self.fragment_prefix + self._path_xpath_for('/'.join(parts)))
+            else:
+                attributes.append(None)
+                # MACHETE(bit4bit) al usar ./ queda ../, ver get_element_text
+                paths.append(re.sub(r'^\.\.+', '.', self.fragment_prefix + self._path_xpath_for(xpath)))
+
+        values = {}
+        for xpath, path, attribute, elem in zip(xpaths, paths, attributes, self._find_elements(paths)):
+            if elem is None:
+                if raise_on_fail:
+                    raise ValueError("xpath %s not found" % (path))
+                values[xpath] = None
+            elif attribute is None:
+                values[xpath] = self.builder.get_text(elem)
+            else:
+                values[xpath] = elem.get(attribute)
+                if values[xpath] is None and raise_on_fail:
+                    raise KeyError(attribute)
+        return values
+
     def exist_element(self, xpath):
-        elem = self.get_element(xpath)
+        return self.is_populated(self.get_element(xpath))
 
+    def is_populated(self, elem):
+        """
+        True si elem existe y no es un placeholder sin poblar.
+        """
         # no se encontro elemento
         if elem is None:
             return False
 
-        # el placeholder no ha sido populado
-        if elem.get('facho_placeholder') == 'True':
-            return False
-
-        # el valor opcional no ha sido populado
-        if elem.get('facho_optional') == 'True':
+        # el placeholder u opcional no ha sido populado
+        if elem in self._placeholders:
             return False
 
         return True
 
-    def _remove_facho_attributes(self, elem):
-        self.builder.remove_attributes(elem, ['facho_optional', 'facho_placeholder'])
+    def _populated(self, elem):
+        self._placeholders.pop(elem, None)
+
+    def _optionals(self):
+        return [elem for elem, optional in self._placeholders.items() if optional]
 
     def tostring(self, **kw):
-        return self.builder.tostring(self.root, **kw)
+        return self.builder.tostring(self.root, self._optionals(), **kw)
+
+    @contextmanager
+    def layout(self):
+        """
+        retorna la raiz tal como se serializa el documento,
+        ver FeXML.layout.
+        """
+        yield self.root
 
     def xpath_from_root(self, xpath):
         nsmap = {}
@@ -9,6 +9,8 @@ from .fe import DianXMLExtensionInvoiceAuthorization
 from .fe import DianXMLExtensionSoftwareProvider
 from .fe import DianXMLExtensionAuthorizationProvider
 from .fe import DianZIP
+from .fe import DianZIPArchive
+from .fe import dian_zips
 from .fe import AMBIENTE_PRUEBAS
 from .fe import AMBIENTE_PRODUCCION
 from . import form_xml
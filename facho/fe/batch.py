@@ -0,0 +1,224 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+generacion de documentos en lote.
+
+cada especificacion (usualmente una linea JSONL) se convierte
+en form.Invoice, se construye el XML, se aplican las extensiones
+(CUFE, proveedor, ...), se firma opcionalmente y se escribe en disco
+repartiendo el trabajo en un grupo de procesos.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import importlib.util
+import json
+import os
+import time
+import traceback
+
+from .form_xml import DIANInvoiceXML, DIANWrite
+from .pool import bounded_map, init_worker, run_worker
+
+__all__ = ['InvoiceBuilder', 'ScriptInvoiceBuilder', 'InvoiceBatch',
+           'BatchResult', 'BatchReport', 'SpecError', 'read_specs']
+
+
+@dataclass
+class SpecError:
+    # linea de la entrada, desde 1
+    line: int
+    error: str
+
+
+def read_specs(stream):
+    """
+    retorna las especificaciones de un archivo JSONL,
+    se ignoran las lineas vacias. una linea invalida retorna
+    SpecError para que el lote continue.
+    """
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield SpecError(lineno, 'line %d: %s' % (lineno, e))
+
+
+class InvoiceBuilder:
+    """
+    convierte una especificacion en documento,
+    debe poder serializarse con pickle para enviarse a cada proceso.
+    """
+
+    def invoice(self, spec):
+        raise NotImplementedError
+
+    def extensions(self, invoice):
+        return []
+
+    def document_xml(self):
+        return DIANInvoiceXML
+
+    def filename(self, invoice):
+        return '%s.xml' % (invoice.invoice_ident)
+
+
+class ScriptInvoiceBuilder(InvoiceBuilder):
+    """
+    usa SCRIPTNAME al estilo de `facho generate-invoice`:
+     def invoice(spec: dict) -> form.Invoice
+     def extensions(form.Invoice): -> List[facho.FachoXMLExtension]
+     def document_xml() -> DIANInvoiceXML (opcional)
+
+    el script se carga una vez por proceso.
+    """
+
+    def __init__(self, scriptname):
+        self.scriptname = scriptname
+        self._module = None
+
+    def __getstate__(self):
+        return {'scriptname': self.scriptname, '_module': None}
+
+    def module(self):
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location('invoice', self.scriptname)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self._module = module
+        return self._module
+
+    def invoice(self, spec):
+        return self.module().invoice(spec)
+
+    def extensions(self, invoice):
+        return self.module().extensions(invoice)
+
+    def document_xml(self):
+        try:
+            return self.module().document_xml()
+        except AttributeError:
+            return super().document_xml()
+
+
+@dataclass
+class BatchResult:
+    # posicion de la especificacion en la entrada
+    index: int
+    filename: str = None
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@dataclass
+class BatchReport:
+    documents: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    def add(self, result):
+        self.documents += 1
+        if not result.ok:
+            self.failed += 1
+
+    def documents_per_second(self):
+        if self.elapsed == 0:
+            return 0.0
+        return self.documents / self.elapsed
+
+    def __str__(self):
+        return "documents: %d failed: %d elapsed: %.2fs throughput: %.1f docs/s" % (
+            self.documents, self.failed, self.elapsed, self.documents_per_second())
+
+
+class _Worker:
+
+    def __init__(self, builder, output_dir, signer):
+        self.builder = builder
+        self.output_dir = output_dir
+        self.signer = signer
+
+    def __call__(self, job):
+        index, spec = job
+        if isinstance(spec, SpecError):
+            return BatchResult(index, error=spec.error)
+        try:
+            return BatchResult(index, filename=self.generate(spec))
+        except Exception:
+            return BatchResult(index, error=traceback.format_exc())
+
+    def generate(self, spec):
+        invoice = self.builder.invoice(spec)
+        invoice.calculate()
+
+        xml = self.builder.document_xml()(invoice)
+        for extension in self.builder.extensions(invoice):
+            xml.add_extension(extension)
+
+        filename = os.path.join(self.output_dir, self.builder.filename(invoice))
+        if self.signer is None:
+            DIANWrite(xml, filename)
+        else:
+            with open(filename, 'w') as f:
+                f.write(self.signer.sign_fachoxml(xml))
+        return filename
+
+
+class InvoiceBatch:
+    """
+    genera documentos desde un iterable de especificaciones.
+
+    los resultados se entregan en el mismo orden de entrada, los
+    errores de cada documento se capturan en BatchResult.error sin
+    detener el lote.
+    """
+
+    def __init__(self, builder, output_dir, signer=None, processes=None, backlog=4):
+        """
+        @param builder InvoiceBuilder
+        @param output_dir directorio donde escribir los documentos
+        @param signer DianXMLExtensionSigner o None para no firmar
+        @param processes cantidad de procesos, 1 ejecuta en el proceso actual
+        @param backlog documentos en vuelo por proceso
+        """
+        self.builder = builder
+        self.output_dir = output_dir
+        self.signer = signer
+        self.processes = processes or os.cpu_count() or 1
+        self.backlog = backlog
+        self.report = BatchReport()
+
+    def run(self, specs):
+        """
+        retorna generador de BatchResult, self.report se
+        actualiza a medida que se consumen los resultados.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        worker = _Worker(self.builder, self.output_dir, self.signer)
+        jobs = enumerate(specs)
+
+        self.report = BatchReport()
+        start = time.perf_counter()
+        if self.processes == 1:
+            results = map(worker, jobs)
+        else:
+            results = self._run_pool(worker, jobs)
+
+        for result in results:
+            self.report.add(result)
+            self.report.elapsed = time.perf_counter() - start
+            yield result
+
+    def _run_pool(self, worker, jobs):
+        window = self.processes * self.backlog
+        with ProcessPoolExecutor(max_workers=self.processes,
+                                 initializer=init_worker,
+                                 initargs=(worker,)) as executor:
+            yield from bounded_map(executor, run_worker, jobs, window)
@@ -1,6 +1,8 @@
 from facho import facho
 
 import zeep
+from zeep.cache import SqliteCache, InMemoryCache
+from zeep.transports import Transport
 from zeep.wsse.username import UsernameToken
 from .wsse.signature import Signature, BinarySignature
 from zeep.wsa import WsAddressingPlugin
@@ -13,12 +15,30 @@ import http.client
 import hashlib
 import secrets
 import base64
+import os
+import sqlite3
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
 
 
 __all__ = ['DianClient',
            'ConsultaResolucionesFacturacionPeticion',
            'ConsultaResolucionesFacturacionRespuesta']
 
+# cache persistente de WSDL/XSD, FACHO_CACHE_DIR permite cambiarla
+WSDL_CACHE_PATH = os.path.join(
+    os.environ.get('FACHO_CACHE_DIR')
+    or os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'facho'),
+    'wsdl.sqlite')
+WSDL_CACHE_TIMEOUT = 24 * 3600
+
+# conexiones HTTP reutilizables por cliente
+POOL_MAXSIZE = 16
+
+_clients_lock = threading.Lock()
+
 class SOAPService:
 
     def wsdl(self):
@@ -221,6 +241,15 @@ class Habilitacion:
             return Habilitacion.WSDL
 
 class DianGateway:
+    """
+    los clientes zeep se crean una vez por WSDL y se reutilizan
+    entre peticiones e hilos, compartiendo la sesion HTTP.
+    """
+
+    _clients = None
+    _transport = None
+    # WSDL que reemplaza el de cada servicio, ej: servidor local de pruebas
+    wsdl = None
 
     def _open(self, service):
         raise NotImplementedError()
@@ -231,6 +260,40 @@ class DianGateway:
     def _close(self, conn):
         return
 
+    def _wsdl_cache(self):
+        try:
+            os.makedirs(os.path.dirname(WSDL_CACHE_PATH), exist_ok=True)
+            return SqliteCache(path=WSDL_CACHE_PATH, timeout=WSDL_CACHE_TIMEOUT)
+        except (OSError, sqlite3.Error):
+            return InMemoryCache(timeout=WSDL_CACHE_TIMEOUT)
+
+    def _build_transport(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return Transport(cache=self._wsdl_cache(), session=session)
+
+    def _wsse(self):
+        return None
+
+    def _client(self, wsdl):
+        """
+        retorna el cliente zeep para el WSDL, se crea en el primer uso.
+        """
+        clients = self._clients
+        if clients is not None and wsdl in clients:
+            return clients[wsdl]
+
+        with _clients_lock:
+            if self._clients is None:
+                self._clients = {}
+            if self._transport is None:
+                self._transport = self._build_transport()
+            if wsdl not in self._clients:
+                self._clients[wsdl] = zeep.Client(wsdl, transport=self._transport, wsse=self._wsse())
+            return self._clients[wsdl]
+
     def request(self, service):
         if not isinstance(service, SOAPService):
             raise TypeError('service not type SOAPService')
@@ -245,30 +308,36 @@ class DianGateway:
 
 class DianClient(DianGateway):
 
-    def __init__(self, user, password):
+    def __init__(self, user, password, wsdl=None):
         self._username = user
         self._password = password
+        self.wsdl = wsdl
+
+    def _wsse(self):
+        return UsernameToken(self._username, self._password)
 
     def _open(self, service):
-        return zeep.Client(service.wsdl(), wsse=UsernameToken(self._username, self._password))
+        return self._client(self.wsdl or service.wsdl())
 
 
 class DianSignatureClient(DianGateway):
 
-    def __init__(self, private_key_path, public_key_path, password=None):
+    def __init__(self, private_key_path, public_key_path, password=None, wsdl=None):
         self.private_key_path = private_key_path
         self.public_key_path = public_key_path
         self.password = password
+        self.wsdl = wsdl
+        self._signature = None
 
-    def _open(self, service):
+    def _wsse(self):
         # RESOLUCCION 0004: pagina 756
-        from zeep.wsse import utils
-
-        client = zeep.Client(service.wsdl(), wsse=
-                             BinarySignature(
-                                 self.private_key_path, self.public_key_path, self.password,
-                                 signature_method=xmlsec.Transform.RSA_SHA256,
-                                 digest_method=xmlsec.Transform.SHA256)
-                             ,
-        )
-        return client
+        # una sola instancia por cliente, la llave se carga una vez
+        if self._signature is None:
+            self._signature = BinarySignature(
+                self.private_key_path, self.public_key_path, self.password,
+                signature_method=xmlsec.Transform.RSA_SHA256,
+                digest_method=xmlsec.Transform.SHA256)
+        return self._signature
+
+    def _open(self, service):
+        return self._client(self.wsdl or service.wsdl())
@@ -0,0 +1,136 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+consultas concurrentes a la DIAN con asyncio.
+
+las peticiones se hacen con un DianGateway (DianClient o
+DianSignatureClient) en un grupo de hilos, reutilizando su cliente
+zeep y sesion HTTP, con concurrencia acotada, limite de peticiones por
+segundo y reintentos con espera exponencial.
+
+ej:
+  client = AsyncDianClient(dian.DianSignatureClient(key, cert), concurrency=8, rate=20)
+  responses = asyncio.run(client.gather_status(track_ids))
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import random
+
+import requests
+import zeep.exceptions
+
+from . import dian
+
+__all__ = ['AsyncDianClient', 'RateLimiter']
+
+
+# errores de red que ameritan reintento, los Fault de la DIAN no
+RETRY_EXCEPTIONS = (
+    requests.RequestException,
+    zeep.exceptions.TransportError,
+    OSError,
+)
+
+
+class RateLimiter:
+    """
+    espacia el inicio de las peticiones a maximo `rate` por segundo.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = None
+        self._loop = None
+
+    async def wait(self):
+        # el lock queda ligado al loop, se crea uno por cada asyncio.run
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+        async with self._lock:
+            now = loop.time()
+            delay = self._next - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+                now = self._next
+            self._next = now + self.interval
+
+
+class AsyncDianClient:
+
+    def __init__(self, gateway, concurrency=8, rate=None,
+                 retries=3, backoff=0.5, max_backoff=10.0):
+        """
+        @param gateway DianClient o DianSignatureClient
+        @param concurrency maximo de peticiones en curso
+        @param rate maximo de peticiones por segundo, None sin limite
+        @param retries reintentos ante errores de red
+        @param backoff espera base en segundos, se duplica en cada reintento
+        @param max_backoff espera maxima en segundos
+        """
+        self.gateway = gateway
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._limiter = RateLimiter(rate) if rate else None
+        self._semaphore = None
+        self._loop = None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        self.close()
+
+    def _delay(self, attempt):
+        # espera exponencial con variacion aleatoria
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    async def request(self, service):
+        # el semaforo queda ligado al loop, se crea uno por cada asyncio.run
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                if self._limiter is not None:
+                    await self._limiter.wait()
+                try:
+                    return await loop.run_in_executor(self._executor, self.gateway.request, service)
+                except RETRY_EXCEPTIONS:
+                    if attempt >= self.retries:
+                        raise
+            # se espera fuera del semaforo para no bloquear a otros
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    async def gather(self, services):
+        """
+        retorna las respuestas en el mismo orden de services,
+        una peticion fallida retorna la excepcion en su posicion.
+        """
+        return await asyncio.gather(*[self.request(service) for service in services],
+                                    return_exceptions=True)
+
+    async def gather_status(self, track_ids, service=dian.GetStatus):
+        """
+        consulta el estado de cada track id.
+
+        @param service dian.GetStatus, dian.GetStatusZip o sus
+        variantes en dian.Habilitacion
+        """
+        return await self.gather([service(track_id) for track_id in track_ids])
@@ -0,0 +1,380 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+servidor SOAP local que imita los servicios de la DIAN, para pruebas
+de carga del cliente.
+
+implementa SendBillSync, SendBillAsync, SendTestSetAsync, GetStatus,
+GetStatusZip, GetNumberingRange y SendNominaSync; si se indica el
+certificado verifica la firma WS-Security de cada peticion.
+
+ej:
+  with DianStub(latency=0.05, error_rate=0.01, certfile='cert.pem') as stub:
+      client = dian.DianSignatureClient(key, cert, wsdl=stub.wsdl)
+      client.request(dian.GetStatus('123'))
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import random
+import threading
+import time
+from xml.sax.saxutils import escape
+
+from lxml import etree
+from zeep.exceptions import SignatureVerificationFailed
+
+from .wsse.signature import verify_envelope
+
+__all__ = ['DianStub']
+
+
+SOAP12_NS = 'http://www.w3.org/2003/05/soap-envelope'
+SERVICE_NS = 'http://wcf.dian.colombia'
+ACTION_PREFIX = 'http://wcf.dian.colombia/IWcfDianCustomerServices/'
+WSSE_NS = 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd'
+DS_NS = 'http://www.w3.org/2000/09/xmldsig#'
+WSU_NS = 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd'
+
+OPERATIONS = ['SendBillSync', 'SendBillAsync', 'SendTestSetAsync', 'GetStatus',
+              'GetStatusZip', 'GetNumberingRange', 'SendNominaSync']
+
+# StatusCode de un ZIP en proceso de validacion
+STATUS_IN_PROCESS = '98'
+
+WSDL = '''<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/"
+                  xmlns:soap12="http://schemas.xmlsoap.org/wsdl/soap12/"
+                  xmlns:wsaw="http://www.w3.org/2006/05/addressing/wsdl"
+                  xmlns:xs="http://www.w3.org/2001/XMLSchema"
+                  xmlns:tns="http://wcf.dian.colombia"
+                  name="WcfDianCustomerServices"
+                  targetNamespace="http://wcf.dian.colombia">
+  <wsdl:types>
+    <xs:schema elementFormDefault="qualified" targetNamespace="http://wcf.dian.colombia">
+      <xs:complexType name="ArrayOfstring">
+        <xs:sequence><xs:element name="string" type="xs:string" minOccurs="0" maxOccurs="unbounded"/></xs:sequence>
+      </xs:complexType>
+      <xs:complexType name="DianResponse">
+        <xs:sequence>
+          <xs:element name="ErrorMessage" type="tns:ArrayOfstring" minOccurs="0" nillable="true"/>
+          <xs:element name="IsValid" type="xs:boolean"/>
+          <xs:element name="StatusCode" type="xs:string"/>
+          <xs:element name="StatusDescription" type="xs:string"/>
+          <xs:element name="StatusMessage" type="xs:string" minOccurs="0"/>
+          <xs:element name="XmlDocumentKey" type="xs:string" minOccurs="0"/>
+          <xs:element name="XmlFileName" type="xs:string" minOccurs="0"/>
+        </xs:sequence>
+      </xs:complexType>
+      <xs:complexType name="ArrayOfDianResponse">
+        <xs:sequence><xs:element name="DianResponse" type="tns:DianResponse" minOccurs="0" maxOccurs="unbounded"/></xs:sequence>
+      </xs:complexType>
+      <xs:complexType name="UploadDocumentResponse">
+        <xs:sequence>
+          <xs:element name="ErrorMessageList" type="tns:ArrayOfstring" minOccurs="0" nillable="true"/>
+          <xs:element name="ZipKey" type="xs:string"/>
+        </xs:sequence>
+      </xs:complexType>
+      <xs:complexType name="NumberRangeResponse">
+        <xs:sequence>
+          <xs:element name="ResolutionNumber" type="xs:string"/>
+          <xs:element name="ResolutionDate" type="xs:string"/>
+          <xs:element name="Prefix" type="xs:string"/>
+          <xs:element name="FromNumber" type="xs:long"/>
+          <xs:element name="ToNumber" type="xs:long"/>
+          <xs:element name="ValidDateFrom" type="xs:string"/>
+          <xs:element name="ValidDateTo" type="xs:string"/>
+          <xs:element name="TechnicalKey" type="xs:string"/>
+        </xs:sequence>
+      </xs:complexType>
+      <xs:complexType name="NumberRangeResponseList">
+        <xs:sequence>
+          <xs:element name="OperationCode" type="xs:string"/>
+          <xs:element name="OperationDescription" type="xs:string"/>
+          <xs:element name="NumberRangeResponse" type="tns:NumberRangeResponse" minOccurs="0" maxOccurs="unbounded"/>
+        </xs:sequence>
+      </xs:complexType>
+%(elements)s
+    </xs:schema>
+  </wsdl:types>
+%(messages)s
+  <wsdl:portType name="IWcfDianCustomerServices">
+%(port_operations)s
+  </wsdl:portType>
+  <wsdl:binding name="WSHttpBinding_IWcfDianCustomerServices" type="tns:IWcfDianCustomerServices">
+    <soap12:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+%(binding_operations)s
+  </wsdl:binding>
+  <wsdl:service name="WcfDianCustomerServices">
+    <wsdl:port name="WSHttpBinding_IWcfDianCustomerServices" binding="tns:WSHttpBinding_IWcfDianCustomerServices">
+      <soap12:address location="%(location)s"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+'''
+
+# operacion -> (parametros, tipo del resultado)
+SIGNATURES = {
+    'SendBillSync': ([('fileName', 'xs:string'), ('contentFile', 'xs:base64Binary')], 'tns:DianResponse'),
+    'SendBillAsync': ([('fileName', 'xs:string'), ('contentFile', 'xs:base64Binary')], 'tns:UploadDocumentResponse'),
+    'SendTestSetAsync': ([('fileName', 'xs:string'), ('contentFile', 'xs:base64Binary'), ('testSetId', 'xs:string')],
+                         'tns:UploadDocumentResponse'),
+    'GetStatus': ([('trackId', 'xs:string')], 'tns:DianResponse'),
+    'GetStatusZip': ([('trackId', 'xs:string')], 'tns:ArrayOfDianResponse'),
+    'GetNumberingRange': ([('accountCode', 'xs:string'), ('accountCodeT', 'xs:string'), ('softwareCode', 'xs:string')],
+                          'tns:NumberRangeResponseList'),
+    'SendNominaSync': ([('contentFile', 'xs:base64Binary')], 'tns:DianResponse'),
+}
+
+
+def build_wsdl(location):
+    elements = []
+    messages = []
+    port_operations = []
+    binding_operations = []
+    for name in OPERATIONS:
+        params, result = SIGNATURES[name]
+        fields = ''.join('<xs:element name="%s" type="%s" minOccurs="0"/>' % param for param in params)
+        elements.append(
+            '      <xs:element name="%s"><xs:complexType><xs:sequence>%s</xs:sequence></xs:complexType></xs:element>\n'
+            '      <xs:element name="%sResponse"><xs:complexType><xs:sequence>'
+            '<xs:element name="%sResult" type="%s" minOccurs="0" nillable="true"/>'
+            '</xs:sequence></xs:complexType></xs:element>' % (name, fields, name, name, result))
+        messages.append(
+            '  <wsdl:message name="%s_InputMessage"><wsdl:part name="parameters" element="tns:%s"/></wsdl:message>\n'
+            '  <wsdl:message name="%s_OutputMessage"><wsdl:part name="parameters" element="tns:%sResponse"/></wsdl:message>'
+            % (name, name, name, name))
+        port_operations.append(
+            '    <wsdl:operation name="%s">'
+            '<wsdl:input wsaw:Action="%s%s" message="tns:%s_InputMessage"/>'
+            '<wsdl:output wsaw:Action="%s%sResponse" message="tns:%s_OutputMessage"/>'
+            '</wsdl:operation>' % (name, ACTION_PREFIX, name, name, ACTION_PREFIX, name, name))
+        binding_operations.append(
+            '    <wsdl:operation name="%s"><soap12:operation soapAction="%s%s" style="document"/>'
+            '<wsdl:input><soap12:body use="literal"/></wsdl:input>'
+            '<wsdl:output><soap12:body use="literal"/></wsdl:output></wsdl:operation>'
+            % (name, ACTION_PREFIX, name))
+
+    return WSDL % {
+        'elements': '\n'.join(elements),
+        'messages': '\n'.join(messages),
+        'port_operations': '\n'.join(port_operations),
+        'binding_operations': '\n'.join(binding_operations),
+        'location': escape(location),
+    }
+
+
+def _element(name, value):
+    if value is None:
+        return '<%s xmlns:i="http://www.w3.org/2001/XMLSchema-instance" i:nil="true"/>' % (name)
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    if isinstance(value, (list, tuple)):
+        return '<%s>%s</%s>' % (name, ''.join(_element('string', v) for v in value), name)
+    return '<%s>%s</%s>' % (name, escape(str(value)), name)
+
+
+def _dian_response(valid, code, description, errors=None, key=''):
+    return ''.join([
+        _element('ErrorMessage', errors or []),
+        _element('IsValid', valid),
+        _element('StatusCode', code),
+        _element('StatusDescription', description),
+        _element('StatusMessage', description),
+        _element('XmlDocumentKey', key),
+    ])
+
+
+class DianStub:
+    """
+    @param latency segundos de espera por peticion, o dict por operacion
+    @param error_rate fraccion de peticiones que responden con Fault
+    @param certfile certificado PEM para verificar WS-Security, None no verifica
+    @param polls_in_process consultas de GetStatusZip que responden en proceso
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0,
+                 certfile=None, polls_in_process=0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.certfile = certfile
+        self.polls_in_process = polls_in_process
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._zip_keys = itertools.count(1)
+        self._polls = {}
+        self.requests = 0
+        self.faults = 0
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d/WcfDianCustomerServices.svc' % (host, port)
+
+    @property
+    def wsdl(self):
+        return self.url + '?wsdl'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._reply(200, build_wsdl(stub.url), 'text/xml; charset=utf-8')
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                status, body = stub.handle(self.rfile.read(length))
+                self._reply(status, body, 'application/soap+xml; charset=utf-8')
+
+            def _reply(self, status, body, content_type):
+                body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def _latency(self, operation):
+        if isinstance(self.latency, dict):
+            return self.latency.get(operation, 0.0)
+        return self.latency
+
+    def handle(self, data):
+        """
+        procesa el sobre SOAP y retorna (estado HTTP, respuesta).
+        """
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+
+        try:
+            envelope = etree.fromstring(data)
+            body = envelope.find('{%s}Body' % (SOAP12_NS))
+            request = body[0]
+            operation = etree.QName(request).localname
+            if operation not in SIGNATURES:
+                raise ValueError('unknown operation %s' % (operation))
+            if self.certfile is not None:
+                # verify_envelope acepta cabeceras Security sin firma
+                if envelope.find('.//{%s}Signature' % (DS_NS)) is None:
+                    raise SignatureVerificationFailed()
+                verify_envelope(envelope, self.certfile)
+        except Exception as e:
+            return self._fault('Sender', 'invalid request: %s' % (repr(e)))
+
+        delay = self._latency(operation)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self._fault('Receiver', 'injected error')
+
+        params = {etree.QName(child).localname: child.text for child in request}
+        result = getattr(self, '_' + operation)(params)
+        return 200, self._envelope(
+            '<%sResponse xmlns="%s"><%sResult>%s</%sResult></%sResponse>' % (
+                operation, SERVICE_NS, operation, result, operation, operation),
+            ACTION_PREFIX + operation + 'Response')
+
+    def _envelope(self, body, action):
+        # como la DIAN, cabecera Security con Timestamp y sin firma
+        now = time.time()
+        return ('<s:Envelope xmlns:s="%s" xmlns:a="http://www.w3.org/2005/08/addressing">'
+                '<s:Header><a:Action s:mustUnderstand="1">%s</a:Action>'
+                '<o:Security xmlns:o="%s" xmlns:u="%s" s:mustUnderstand="1">'
+                '<u:Timestamp u:Id="_0"><u:Created>%s</u:Created><u:Expires>%s</u:Expires></u:Timestamp>'
+                '</o:Security></s:Header>'
+                '<s:Body>%s</s:Body></s:Envelope>' % (
+                    SOAP12_NS, action, WSSE_NS, WSU_NS,
+                    time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(now)),
+                    time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(now + 300)),
+                    body))
+
+    def _fault(self, code, reason):
+        with self._lock:
+            self.faults += 1
+        return 500, self._envelope(
+            '<s:Fault><s:Code><s:Value>s:%s</s:Value></s:Code>'
+            '<s:Reason><s:Text xml:lang="es-CO">%s</s:Text></s:Reason></s:Fault>' % (code, escape(reason)),
+            'http://www.w3.org/2005/08/addressing/soap/fault')
+
+    def _upload(self, params):
+        zip_key = 'stub-%08d' % (next(self._zip_keys))
+        with self._lock:
+            self._polls[zip_key] = 0
+        return _element('ErrorMessageList', []) + _element('ZipKey', zip_key)
+
+    def _SendBillSync(self, params):
+        return _dian_response(True, '00', 'Procesado Correctamente.', key=params.get('fileName'))
+
+    _SendBillAsync = _upload
+    _SendTestSetAsync = _upload
+
+    def _GetStatus(self, params):
+        return _dian_response(True, '00', 'Procesado Correctamente.', key=params.get('trackId'))
+
+    def _GetStatusZip(self, params):
+        zip_key = params.get('trackId')
+        with self._lock:
+            polls = self._polls.get(zip_key)
+            if polls is not None:
+                self._polls[zip_key] = polls + 1
+
+        if polls is None:
+            response = _dian_response(False, '66', 'TrackId no existe', ['TrackId no existe'], zip_key)
+        elif polls < self.polls_in_process:
+            response = _dian_response(False, STATUS_IN_PROCESS, 'En proceso de validacion', key=zip_key)
+        else:
+            response = _dian_response(True, '00', 'Procesado Correctamente.', key=zip_key)
+        return '<DianResponse>%s</DianResponse>' % (response)
+
+    def _GetNumberingRange(self, params):
+        return ''.join([
+            _element('OperationCode', '100'),
+            _element('OperationDescription', 'Acción completada OK.'),
+            '<NumberRangeResponse>%s</NumberRangeResponse>' % ''.join([
+                _element('ResolutionNumber', '18760000001'),
+                _element('ResolutionDate', '2019-01-19'),
+                _element('Prefix', 'SETP'),
+                _element('FromNumber', 990000000),
+                _element('ToNumber', 995000000),
+                _element('ValidDateFrom', '2019-01-19'),
+                _element('ValidDateTo', '2030-01-19'),
+                _element('TechnicalKey', 'fc8eac422eba16e22ffd8c6f94b3f40a6e38162c'),
+            ]),
+        ])
+
+    def _SendNominaSync(self, params):
+        return _dian_response(True, '00', 'Procesado Correctamente.')
@@ -8,6 +8,9 @@ admittedly painful, will likely assist in understanding the code in this
 module.
 
 """
+import os
+import threading
+
 import pytz
 from datetime import datetime, timedelta
 from lxml import etree
@@ -41,6 +44,31 @@ def _make_sign_key(key_data, cert_data, password):
     return key
 
 
+# (llave, mtime, certificado, mtime, password) -> xmlsec.Key
+_sign_keys = {}
+_sign_keys_lock = threading.Lock()
+
+
+def load_sign_key(key_file, certfile, password=None):
+    """
+    retorna la llave de firma con su certificado, se carga una vez
+    mientras no cambien los archivos.
+    """
+    key_file = os.path.abspath(key_file)
+    certfile = os.path.abspath(certfile)
+    cache_key = (key_file, os.stat(key_file).st_mtime_ns,
+                 certfile, os.stat(certfile).st_mtime_ns, password)
+    key = _sign_keys.get(cache_key)
+    if key is None:
+        key = _make_sign_key(_read_file(key_file), _read_file(certfile), password)
+        with _sign_keys_lock:
+            # se descartan versiones anteriores de los mismos archivos
+            for old in [k for k in _sign_keys if k[0] == key_file and k[2] == certfile]:
+                del _sign_keys[old]
+            _sign_keys[cache_key] = key
+    return key
+
+
 def _make_verify_key(cert_data):
     key = xmlsec.Key.from_memory(cert_data, xmlsec.KeyFormat.CERT_PEM, None)
     return key
@@ -66,9 +94,16 @@ class MemorySignature(object):
         self.digest_method = digest_method
         self.signature_method = signature_method
         self.expires_dt = expires_dt
+        self._key = None
+
+    def _sign_key(self):
+        # xmlsec copia la llave en cada SignatureContext
+        if self._key is None:
+            self._key = _make_sign_key(self.key_data, self.cert_data, self.password)
+        return self._key
 
     def apply(self, envelope, headers):
-        key = _make_sign_key(self.key_data, self.cert_data, self.password)
+        key = self._sign_key()
         _sign_envelope_with_key(
             envelope, key, self.signature_method, self.digest_method, expires_dt=self.expires_dt
         )
@@ -98,6 +133,11 @@ class Signature(MemorySignature):
             signature_method,
             digest_method,
         )
+        self.key_file = key_file
+        self.certfile = certfile
+
+    def _sign_key(self):
+        return load_sign_key(self.key_file, self.certfile, self.password)
 
 
 class BinarySignature(Signature):
@@ -106,7 +146,7 @@ class BinarySignature(Signature):
     Place the key information into BinarySecurityElement."""
 
     def apply(self, envelope, headers):
-        key = _make_sign_key(self.key_data, self.cert_data, self.password)
+        key = self._sign_key()
         _sign_envelope_with_key_binary(
             envelope, key, self.signature_method, self.digest_method, expires_dt = self.expires_dt
         )
@@ -1,16 +1,149 @@
+"""
+esquemas XSD de la DIAN.
+
+los esquemas se compilan en el primer uso y se mantienen por proceso,
+ej: XSD.UBLInvoice o XSD.schema('UBLInvoice').
+
+la compilacion toma segundos, si se indica CACHE_DIR (o la variable
+de entorno FACHO_XSD_CACHE_DIR) el esquema compilado se persiste con
+pickle y se reutiliza mientras no cambien los archivos .xsd.
+"""
+
+import hashlib
+import os
 import os.path
+import pickle
+import sys
+import threading
+
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = os.environ.get('FACHO_XSD_CACHE_DIR')
+
+# nombre -> (directorio, archivo)
+SCHEMAS = {
+    'UBLInvoice': ('maindoc', 'UBL-Invoice-2.1.xsd'),
+    'UBLCreditNote': ('maindoc', 'UBL-CreditNote-2.1.xsd'),
+    'UBLDebitNote': ('maindoc', 'UBL-DebitNote-2.1.xsd'),
+    'UBLAttachedDocument': ('maindoc', 'UBL-AttachedDocument-2.1.xsd'),
+    'NominaIndividual': ('nomina', 'NominaIndividualElectronicaXSDV1.0.6.xsd'),
+    'NominaIndividualDeAjuste': ('nomina', 'NominaIndividualDeAjusteElectronicaXSDV1.0.6.xsd'),
+}
 
-import xmlschema
+_schemas = {}
+_lxml_schemas = {}
+_lock = threading.RLock()
 
 
 def path_for_xsd(dirname, xsdname):
-    data_dir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(data_dir, dirname, xsdname)
+    return os.path.join(DATA_DIR, dirname, xsdname)
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _cache_path(path):
+    import xmlschema
+    name = '%s.%s.xmlschema%s.py%d%d.pickle' % (
+        os.path.basename(path), hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12],
+        xmlschema.__version__, *sys.version_info[:2])
+    return os.path.join(CACHE_DIR, name)
+
+
+def _load_cached(path):
+    try:
+        with open(_cache_path(path), 'rb') as f:
+            sources = pickle.load(f)
+            for source, key in sources:
+                if _stat_key(source) != key:
+                    return None
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _save_cached(path, schema):
+    # archivos locales que componen el esquema (includes e imports)
+    sources = []
+    for source in schema.maps.iter_schemas():
+        url = source.url or ''
+        if url.startswith('file://'):
+            url = url[len('file://'):]
+        if os.path.isfile(url):
+            sources.append((url, _stat_key(url)))
+
+    cache_path = _cache_path(path)
+    tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(sources, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(schema, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def compile_schema(path):
+    """
+    compila el esquema, usando la cache persistente si existe.
+    """
+    # xmlschema solo se importa al compilar
+    import xmlschema
+
+    if CACHE_DIR:
+        schema = _load_cached(path)
+        if schema is not None:
+            return schema
+
+    schema = xmlschema.XMLSchema(path)
+    if CACHE_DIR:
+        _save_cached(path, schema)
+    return schema
+
+
+def schema(name):
+    """
+    retorna el esquema compilado, se compila una vez por proceso.
+    """
+    try:
+        return _schemas[name]
+    except KeyError:
+        pass
+
+    dirname, xsdname = SCHEMAS[name]
+    with _lock:
+        if name not in _schemas:
+            _schemas[name] = compile_schema(path_for_xsd(dirname, xsdname))
+    return _schemas[name]
+
+
+def lxml_schema(name):
+    """
+    retorna el esquema compilado con lxml (libxml2), mucho mas rapido
+    que xmlschema pero con errores menos detallados.
+    """
+    try:
+        return _lxml_schemas[name]
+    except KeyError:
+        pass
+
+    from lxml import etree
+    dirname, xsdname = SCHEMAS[name]
+    with _lock:
+        if name not in _lxml_schemas:
+            _lxml_schemas[name] = etree.XMLSchema(etree.parse(path_for_xsd(dirname, xsdname)))
+    return _lxml_schemas[name]
+
 
-UBLInvoice= xmlschema.XMLSchema(path_for_xsd('maindoc', 'UBL-Invoice-2.1.xsd'))
+def __getattr__(name):
+    if name in SCHEMAS:
+        return schema(name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
-NominaIndividual = xmlschema.XMLSchema(path_for_xsd('nomina', 'NominaIndividualElectronicaXSDV1.0.6.xsd'))
-NominaIndividualDeAjuste = xmlschema.XMLSchema(path_for_xsd('nomina', 'NominaIndividualDeAjusteElectronicaXSDV1.0.6.xsd'))
 
 def validate(xml, schema):
     schema.validate(xml)
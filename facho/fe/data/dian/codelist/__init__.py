@@ -1,44 +1,126 @@
+import marshal
 import os.path
+import sys
+import threading
+import unicodedata
 
 from lxml import etree
 
 
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# cache precompilada de las listas, FACHO_CACHE_DIR permite cambiarla
+CACHE_DIR = os.path.join(
+    os.environ.get('FACHO_CACHE_DIR')
+    or os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'facho'),
+    'codelist')
 
-class CodeList:
+_load_lock = threading.RLock()
 
-    def __init__(self, filename, primary_column, name_column):
-        self.short_name = ''
-        self.long_name = ''
-        self.version = 1
 
-        self.name_column = name_column
-        self.rows = {}
-        self._load(filename, primary_column)
+def normalize_value(value):
+    """
+    valor sin tildes ni distincion de mayusculas.
+    """
+    value = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in value if not unicodedata.combining(c)).casefold()
 
-    def _load(self, filename, primary_column):
-        tree = etree.parse(filename)
 
-        #obtener identificadores...
-        self.short_name = tree.find('./Identification/ShortName').text
-        self.long_name = tree.find('./Identification/LongName').text
-        self.version = tree.find('./Identification/Version').text
+def _read_genericode(filename, primary_column):
+    tree = etree.parse(filename)
 
-        #obtener registros...
-        for row in tree.findall('./SimpleCodeList/Row'):
-            new_row = self.xmlrow_to_dict(row)
-            primary_key = new_row[primary_column]
-            self.rows[primary_key] = new_row.copy()
-
-    def xmlrow_to_dict(self, xmlrow):
+    #obtener registros...
+    rows = {}
+    for xmlrow in tree.findall('./SimpleCodeList/Row'):
         row = {}
-
         #construir registro...
         for value in xmlrow.getchildren():
             row[value.attrib['ColumnRef']] = value.getchildren()[0].text
+        rows[row[primary_column]] = row
+
+    #obtener identificadores...
+    return {
+        'short_name': tree.find('./Identification/ShortName').text,
+        'long_name': tree.find('./Identification/LongName').text,
+        'version': tree.find('./Identification/Version').text,
+        'rows': rows,
+    }
+
+
+def _cache_path(filename, primary_column):
+    return os.path.join(CACHE_DIR, '%s.%s.py%d%d.marshal' % (
+        os.path.basename(filename), primary_column, *sys.version_info[:2]))
+
+
+def load_genericode(filename, primary_column):
+    """
+    retorna identificadores y registros del archivo genericode,
+    usa la cache mientras no cambie la fecha de modificacion del archivo.
+    """
+    stat = os.stat(filename)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cache_path = _cache_path(filename, primary_column)
+
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_key, data = marshal.load(f)
+        if tuple(cached_key) == key:
+            return data
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    data = _read_genericode(filename, primary_column)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            marshal.dump((key, data), f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return data
 
-        return row
+
+class CodeList:
+    """
+    lista de codigos genericode, se carga en el primer acceso.
+    """
+
+    def __init__(self, filename, primary_column, name_column):
+        self.name_column = name_column
+        self._filename = filename
+        self._primary_column = primary_column
+        self._updates = []
+        self._data = None
+        # (columna, insensible) -> {valor: registro}
+        self._indexes = {}
+
+    def _load(self):
+        if self._data is None:
+            with _load_lock:
+                if self._data is None:
+                    data = load_genericode(self._filename, self._primary_column)
+                    for other in self._updates:
+                        data['rows'].update(other.rows)
+                    self._updates = []
+                    self._data = data
+        return self._data
+
+    @property
+    def short_name(self):
+        return self._load()['short_name']
+
+    @property
+    def long_name(self):
+        return self._load()['long_name']
+
+    @property
+    def version(self):
+        return self._load()['version']
+
+    @property
+    def rows(self):
+        return self._load()['rows']
 
     def __getitem__(self, key):
         return self.rows[str(key)]
@@ -46,15 +128,47 @@ class CodeList:
     def __contains__(self, key):
         return key in self.rows
 
-    def by_name(self, name):
-        for k, v in self.rows.items():
-            if v[self.name_column] == name:
-                return v
-        raise KeyError
+    def _index(self, column, insensitive):
+        key = (column, insensitive)
+        index = self._indexes.get(key)
+        if index is None:
+            with _load_lock:
+                index = self._indexes.get(key)
+                if index is None:
+                    index = {}
+                    for row in self.rows.values():
+                        value = row.get(column)
+                        if value is None:
+                            continue
+                        if insensitive:
+                            value = normalize_value(value)
+                        # igual que el recorrido lineal gana el primer registro
+                        index.setdefault(value, row)
+                    self._indexes[key] = index
+        return index
+
+    def by_column(self, column, value, insensitive=False):
+        """
+        retorna el registro donde la columna tiene el valor,
+        con insensitive se ignoran tildes y mayusculas.
+        """
+        if insensitive:
+            value = normalize_value(value)
+        try:
+            return self._index(column, insensitive)[value]
+        except KeyError:
+            raise KeyError(value) from None
+
+    def by_name(self, name, insensitive=False):
+        return self.by_column(self.name_column, name, insensitive)
 
     def update(self, other):
-        for k, v in other.rows.items():
-            self.rows[k] = v
+        with _load_lock:
+            if self._data is None:
+                self._updates.append(other)
+            else:
+                self._data['rows'].update(other.rows)
+                self._indexes = {}
         return self
 
 # nombres de variables igual a ./Identification/ShortName
@@ -10,11 +10,21 @@ import OpenSSL
 import zipfile
 import warnings
 import hashlib
+import base64
+import threading
+import itertools
+import io
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
 from .data.dian import codelist
+from .pool import bounded_map
 from . import form
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from pathlib import Path
+from xml.sax.saxutils import quoteattr
+from lxml import etree
 
 AMBIENTE_PRUEBAS = codelist.TipoAmbiente.by_name('Pruebas')['code']
 AMBIENTE_PRODUCCION = codelist.TipoAmbiente.by_name('Producción')['code']
@@ -29,6 +39,7 @@ SCHEME_AGENCY_ATTRS = {
 # RESOLUCION 0001: pagina 516
 POLICY_ID = 'https://facturaelectronica.dian.gov.co/politicadefirma/v2/politicadefirmav2.pdf'
 POLICY_NAME = u'Política de firma para facturas electrónicas de la República de Colombia.'
+POLICY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'dian', 'politicadefirmav2.pdf')
 
 
 NAMESPACES = {
@@ -57,44 +68,161 @@ def fe_from_string(document: str) -> FachoXML:
     return FeXML.from_string(document)
 
 from contextlib import contextmanager
-@contextmanager
-def mock_xades_policy():
-    from mock import patch
-    import os.path
-    with patch('xades.policy.urllib.urlopen') as mock:
-        class UrllibPolicyMock:
-            def read(self):
-                # Usamos contenido de archivo local
-                cur_dir = os.path.dirname(os.path.abspath(__file__))
-                data_dir = os.path.join(cur_dir, 'data', 'dian')
-                policy_file = os.path.join(data_dir, 'politicadefirmav2.pdf')
-                with open(policy_file, 'rb') as f:
-                    return f.read()
-
-        mock.return_value = UrllibPolicyMock()
-        yield
+
+
+def load_pkcs12(data, passphrase=None):
+    """
+    decodifica PKCS#12 y retorna (llave privada, certificado)
+    en el formato que espera xmlsig.SignatureContext.load_pkcs12.
+    """
+    pkcs12 = OpenSSL.crypto.load_pkcs12(data, passphrase)
+    return (pkcs12.get_privatekey().to_cryptography_key(),
+            pkcs12.get_certificate().to_cryptography())
+
+
+def signature_policy(policy=None, localpolicy=True):
+    """
+    retorna policy o la politica por defecto con su digest calculado.
+    """
+    if policy is None:
+        if localpolicy:
+            policy = DianSignaturePolicy.local()
+        else:
+            policy = DianSignaturePolicy()
+    policy.digest()
+    return policy
+
+
+class DianSignaturePolicy(xades.policy.GenericPolicyId):
+    """
+    politica de firma DIAN, el documento y su digest
+    se calculan una sola vez por instancia.
+
+    document: contenido de la politica, None la descarga desde POLICY_ID.
+    """
+
+    _local = None
+    _local_lock = threading.Lock()
+
+    def __init__(self, document=None):
+        super().__init__(POLICY_ID, POLICY_NAME, xmlsig.constants.TransformSha256)
+        self._policy = document
+        self._digest = None
+
+    @classmethod
+    def local(cls):
+        """
+        politica incluida en facho, se lee una sola vez por proceso.
+        """
+        if cls.__dict__.get('_local') is None:
+            with cls._local_lock:
+                if cls.__dict__.get('_local') is None:
+                    with open(POLICY_PATH, 'rb') as f:
+                        policy = cls(f.read())
+                    policy.digest()
+                    cls._local = policy
+        return cls._local
+
+    def _resolve_policy(self, identifier):
+        if self._policy is None:
+            self._policy = super()._resolve_policy(identifier)
+        return self._policy
+
+    def digest(self):
+        if self._digest is None:
+            hash_calc = hashlib.new(xmlsig.constants.TransformUsageDigestMethod[self.hash_method])
+            hash_calc.update(self.policy)
+            self._digest = base64.b64encode(hash_calc.digest()).decode()
+        return self._digest
+
+    def produce_policy_node(self, node):
+        transforms = node.find('etsi:SignaturePolicyId/ds:Transforms', namespaces=xades.constants.NS_MAP)
+        if transforms is not None:
+            return super().produce_policy_node(node)
+
+        node.append(xades.policy.ETSI.SignaturePolicyId(
+            xades.policy.ETSI.SigPolicyId(xades.policy.ETSI.Identifier(), xades.policy.ETSI.Description()),
+            xades.policy.ETSI.SigPolicyHash(
+                xades.policy.DS.DigestMethod(Algorithm=self.hash_method),
+                xades.policy.DS.DigestValue(self.digest()),
+            ),
+        ))
+
+    def validate_policy_node(self, node):
+        if node.find('etsi:SignaturePolicyImplied', namespaces=xades.constants.NS_MAP) is not None:
+            return
+        data = self._query_signature_policy_identifer_data(node)
+        if data['Transforms'] is not None or data['DigestMethodAlgorithm'] != self.hash_method:
+            return super().validate_policy_node(node)
+        assert data['DigestValue'] == self.digest()
 
         
 class FeXML(FachoXML):
 
-    def __init__(self, root, namespace):
-
-        super().__init__("{%s}%s" % (namespace, root),
+    def __init__(self, root, namespace, attributes=()):
+        """
+        attributes: pares (nombre, valor) de la raiz,
+        el nombre puede usar un prefijo de NAMESPACES ej: xsi:schemaLocation.
+        """
+        super().__init__(self._build_root(root, namespace, NAMESPACES, attributes),
                          nsmap=NAMESPACES)
 
     @classmethod
     def from_string(cls, document: str) -> 'FeXML':
         return super().from_string(document, namespaces=NAMESPACES)
-    
-    def tostring(self, **kw):
+
+    @classmethod
+    def _build_root(cls, tag, namespace, nsmap, attributes):
         # MACHETE(bit4bit) la DIAN espera que la etiqueta raiz no este en un namespace
-        root_namespace = self.root_namespace()
-        xmlns_name = {v: k for k, v in NAMESPACES.items()}[root_namespace]
-        return super().tostring(**kw)\
-            .replace(xmlns_name + ':', '')\
-            .replace('xmlns:'+xmlns_name, 'xmlns')\
-            .replace('schemaLocation', 'xsi:schemaLocation')
-    
+        attrs = []
+        for prefix, uri in nsmap.items():
+            if uri == namespace and namespace is not None:
+                attrs.append('xmlns=%s' % (quoteattr(uri)))
+                namespace = None
+            else:
+                attrs.append('xmlns:%s=%s' % (prefix, quoteattr(uri)))
+        if namespace is not None:
+            attrs.append('xmlns=%s' % (quoteattr(namespace)))
+
+        for key, value in attributes:
+            attrs.append('%s=%s' % (key, quoteattr(value)))
+
+        return LXMLBuilder.from_string('<%s %s/>' % (tag, ' '.join(attrs)))
+
+    def tostring(self, **kw):
+        with self.layout() as root:
+            return self.builder.tostring(root, self._optionals(), **kw)
+
+    def _layout_root(self):
+        attributes = []
+        for key, value in self.root.attrib.items():
+            if key == 'schemaLocation':
+                key = 'xsi:schemaLocation'
+            attributes.append((key, value))
+
+        qname = etree.QName(self.root)
+        return self._build_root(qname.localname, qname.namespace, self.root.nsmap, attributes)
+
+    @contextmanager
+    def layout(self):
+        """
+        retorna la raiz como la espera la DIAN.
+
+        la raiz se construye asi desde __init__, si luego fue modificada
+        (ej: atributo schemaLocation sin prefijo) se mueven temporalmente
+        los hijos a una raiz corregida y al salir se restauran.
+        """
+        if self.root.prefix is None and 'schemaLocation' not in self.root.attrib:
+            yield self.root
+            return
+
+        root = self._layout_root()
+        root.extend(list(self.root))
+        try:
+            yield root
+        finally:
+            self.root.extend(list(root))
+
 class DianXMLExtensionCUDFE(FachoXMLExtension):
 
     def __init__(self, invoice, tipo_ambiente = AMBIENTE_PRUEBAS):
@@ -284,25 +412,70 @@ class DianXMLExtensionSoftwareSecurityCode(FachoXMLExtension):
 
 
 class DianXMLExtensionSigner:
+    """
+    verify_after_sign: True verifica cada firma, False ninguna
+    y un entero N verifica una de cada N firmas.
+    policy: DianSignaturePolicy a usar, por defecto la incluida
+    en facho (localpolicy) o la descargada de la DIAN.
+    """
 
-    def __init__(self, pkcs12_path, passphrase=None, localpolicy=True):
-        self._pkcs12_data = open(pkcs12_path, 'rb').read()
-        self._passphrase = None
-        self._localpolicy = localpolicy
-        if passphrase:
-            self._passphrase = passphrase.encode('utf-8')
+    def __init__(self, pkcs12_path, passphrase=None, localpolicy=True, verify_after_sign=True, policy=None):
+        self._setup(open(pkcs12_path, 'rb').read(), passphrase, localpolicy, verify_after_sign, policy)
 
     @classmethod
-    def from_bytes(cls, data, passphrase=None, localpolicy=True):
+    def from_bytes(cls, data, passphrase=None, localpolicy=True, verify_after_sign=True, policy=None):
         self = cls.__new__(cls)
-        
+        self._setup(data, passphrase, localpolicy, verify_after_sign, policy)
+        return self
+
+    def _setup(self, data, passphrase, localpolicy, verify_after_sign, policy):
         self._pkcs12_data = data
         self._passphrase = None
         self._localpolicy = localpolicy
+        self._policy_provider = policy
         if passphrase:
             self._passphrase = passphrase.encode('utf-8')
-            
-        return self
+
+        if verify_after_sign is not True and verify_after_sign is not False:
+            if int(verify_after_sign) < 1:
+                raise ValueError('verify_after_sign expected True, False or N >= 1')
+        self._verify_after_sign = verify_after_sign
+        self._signed = itertools.count()
+
+        # llave, certificado y politica se cargan una sola vez
+        # y se comparten entre hilos, ver _signing_context
+        self._lock = threading.Lock()
+        self._key = None
+        self._policy = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        del state['_signed']
+        state['_key'] = None
+        state['_policy'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._signed = itertools.count()
+
+    def _should_verify(self):
+        if self._verify_after_sign is True or self._verify_after_sign is False:
+            return self._verify_after_sign
+        return next(self._signed) % self._verify_after_sign == 0
+
+    def _signing_context(self):
+        if self._key is None:
+            with self._lock:
+                if self._key is None:
+                    self._policy = signature_policy(self._policy_provider, self._localpolicy)
+                    self._key = load_pkcs12(self._pkcs12_data, self._passphrase)
+
+        ctx = xades.XAdESContext(self._policy)
+        ctx.load_pkcs12(self._key)
+        return ctx
 
     def _element_extension_content(self, fachoxml):
         return fachoxml.builder.xpath(fachoxml.root, './ext:UBLExtensions/ext:UBLExtension[2]/ext:ExtensionContent')
@@ -318,6 +491,25 @@ class DianXMLExtensionSigner:
 
         return fachoxml.tostring(xml_declaration=True, encoding='UTF-8')
 
+    def sign_fachoxml(self, fachoxml):
+        """
+        firma el documento en memoria y retorna el XML firmado,
+        equivale a sign_xml_string(fachoxml.tostring()) sin volver
+        a analizar el documento, fachoxml queda sin cambios.
+        """
+        with fachoxml.builder._without_optionals(fachoxml.root, fachoxml._optionals()):
+            with fachoxml.layout() as root:
+                signature = self.sign_xml_element(root)
+
+                document = FachoXML(root, nsmap=NAMESPACES)
+                #DIAN 1.7.-2020: FAB01
+                extcontent = self._element_extension_content(document)
+                document.append_element(extcontent, signature)
+                try:
+                    return document.tostring(xml_declaration=True, encoding='UTF-8')
+                finally:
+                    extcontent.remove(signature)
+
     def sign_xml_element(self, xml):
         id_uuid = str(uuid.uuid4())
         signature = xmlsig.template.create(
@@ -356,20 +548,9 @@ class DianXMLExtensionSigner:
         props = xades.template.create_signed_properties(qualifying, name=id_props, datetime=datetime.now())
         xades.template.add_claimed_role(props, "supplier")
 
-        policy = xades.policy.GenericPolicyId(
-            POLICY_ID,
-            POLICY_NAME,
-            xmlsig.constants.TransformSha256)
-        ctx = xades.XAdESContext(policy)
-        ctx.load_pkcs12(OpenSSL.crypto.load_pkcs12(self._pkcs12_data,
-                                                   self._passphrase))
-
-        if self._localpolicy:
-            with mock_xades_policy():
-                ctx.sign(signature)
-                ctx.verify(signature)
-        else:
-            ctx.sign(signature)
+        ctx = self._signing_context()
+        ctx.sign(signature)
+        if self._should_verify():
             ctx.verify(signature)
         #xmlsig take parent root
         xml.remove(signature)
@@ -449,25 +630,63 @@ class DianZIP:
     # RESOLUCION 0001: pagina 540
     MAX_FILES = 50
 
-    def __init__(self, file_like):
+    def __init__(self, file_like, max_files=MAX_FILES):
+        """
+        @param file_like archivo binario o ruta del ZIP
+        @param max_files maximo de documentos por ZIP
+        """
         self.zipfile = zipfile.ZipFile(file_like, mode='w', compression=zipfile.ZIP_DEFLATED)
+        self.max_files = max_files
         self.num_files = 0
 
+    def is_full(self):
+        return self.num_files >= self.max_files
+
     def add_xml(self, name, xml_data):
+        """
+        archiva el documento, xml_data puede ser str, bytes,
+        Path, archivo binario o iterable de fragmentos str/bytes;
+        el contenido se comprime a medida que se escribe.
+        """
+        if self.is_full():
+            raise ValueError('DianZIP admite maximo %d documentos' % (self.max_files))
         self.num_files += 1
         # TODO cual es la norma para los nombres de archivos?
         m = hashlib.sha256()
         m.update(name.encode('utf-8'))
         filename = m.hexdigest() + '.xml'
         with self.zipfile.open(filename, 'w') as fp:
-            fp.write(xml_data.encode('utf-8'))
+            self._write(fp, xml_data)
 
         return filename
 
+    def add_file(self, name, path):
+        return self.add_xml(name, Path(path))
+
+    @staticmethod
+    def _write(fp, xml_data):
+        if isinstance(xml_data, str):
+            fp.write(xml_data.encode('utf-8'))
+        elif isinstance(xml_data, (bytes, bytearray, memoryview)):
+            fp.write(xml_data)
+        elif isinstance(xml_data, os.PathLike):
+            with open(xml_data, 'rb') as f:
+                shutil.copyfileobj(f, fp)
+        elif hasattr(xml_data, 'read'):
+            shutil.copyfileobj(xml_data, fp)
+        else:
+            for chunk in xml_data:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                fp.write(chunk)
+
     # DEPRECATED usar add_xml
     def add_invoice_xml(self, name, xml_data):
         return self.add_xml(name, xml_data)
 
+    def close(self):
+        self.zipfile.close()
+
     def __enter__(self):
         """
         Facilita el uso de esta manera:
@@ -482,14 +701,60 @@ class DianZIP:
         return self.zipfile.close()
 
 
+# content: bytes del ZIP, filenames: [(nombre, nombre en el ZIP)]
+DianZIPArchive = namedtuple('DianZIPArchive', ['content', 'filenames'])
+
+
+def dian_zips(documents, max_files=DianZIP.MAX_FILES):
+    """
+    archiva los documentos en ZIP de maximo max_files documentos,
+    util para enviar lotes con SendBillAsync o SendTestSetAsync.
+
+    @param documents iterable de (nombre, xml_data) ver DianZIP.add_xml
+    @return generador de DianZIPArchive
+    """
+    zipdata = None
+    for name, xml_data in documents:
+        if zipdata is None:
+            zipdata = io.BytesIO()
+            dianzip = DianZIP(zipdata, max_files=max_files)
+            filenames = []
+        filenames.append((name, dianzip.add_xml(name, xml_data)))
+        if dianzip.is_full():
+            dianzip.close()
+            yield DianZIPArchive(zipdata.getvalue(), filenames)
+            zipdata = None
+
+    if zipdata is not None:
+        dianzip.close()
+        yield DianZIPArchive(zipdata.getvalue(), filenames)
+
+
 class DianXMLExtensionSignerVerifier:
 
-    def __init__(self, pkcs12_path_or_bytes, passphrase=None, localpolicy=True):
+    def __init__(self, pkcs12_path_or_bytes, passphrase=None, localpolicy=True, policy=None):
         self._pkcs12_path_or_bytes = pkcs12_path_or_bytes
         self._passphrase = None
         self._localpolicy = localpolicy
+        self._policy_provider = policy
         if passphrase:
             self._passphrase = passphrase.encode('utf-8')
+        self._key = None
+        self._policy = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_key'] = None
+        state['_policy'] = None
+        return state
+
+    def _load_key(self):
+        if self._key is None:
+            pkcs12_data = self._pkcs12_path_or_bytes
+            if isinstance(self._pkcs12_path_or_bytes, str):
+                pkcs12_data = open(self._pkcs12_path_or_bytes, 'rb').read()
+            self._key = load_pkcs12(pkcs12_data, self._passphrase)
+        return self._key
 
     def verify_string(self, document):
         # Obtener FachoXML
@@ -505,18 +770,59 @@ class DianXMLExtensionSignerVerifier:
         fachoxml.root.append(signature)
 
         # Verificar archivo usando Signature
-        pkcs12_data = self._pkcs12_path_or_bytes
-        if isinstance(self._pkcs12_path_or_bytes, str):
-            pkcs12_data = open(self._pkcs12_path_or_bytes, 'rb').read()
-        ctx = xades.XAdESContext()
-        ctx.load_pkcs12(OpenSSL.crypto.load_pkcs12(pkcs12_data,
-                                                   self._passphrase))
         try:
-            if self._localpolicy:
-                with mock_xades_policy():
-                    ctx.verify(signature)
-            else:
-                ctx.verify(signature)
+            # sin politica indicada se usa la incluida en facho,
+            # la verificacion no descarga nada de la red
+            if self._policy is None:
+                self._policy = signature_policy(self._policy_provider, localpolicy=True)
+            ctx = xades.XAdESContext(self._policy)
+            ctx.load_pkcs12(self._load_key())
+            ctx.verify(signature)
             return True
         except:
             return False
+
+    def _verify_document(self, name_document):
+        name, document = name_document
+        try:
+            return (name, self.verify_string(document))
+        except Exception:
+            return (name, False)
+
+    @classmethod
+    def _documents(cls, path):
+        from .validation import iter_documents
+        return iter_documents(path)
+
+    def verify_path(self, path, processes=None, backlog=4):
+        """
+        verifica los documentos .xml de un directorio o archivo ZIP.
+        retorna lista de (nombre, valido) ordenada por nombre.
+
+        @param processes cantidad de procesos, 1 verifica en el proceso actual
+        @param backlog documentos en vuelo por proceso
+        """
+        documents = self._documents(path)
+        processes = processes or os.cpu_count() or 1
+        if processes == 1:
+            return list(map(self._verify_document, documents))
+
+        # el verificador se instala una vez por proceso, la llave
+        # se decodifica en el primer documento y se reutiliza
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=_init_verifier,
+                                 initargs=(self,)) as executor:
+            return list(bounded_map(executor, _run_verifier, documents, processes * backlog))
+
+
+# verificador del proceso actual, ver _init_verifier
+_verifier = None
+
+
+def _init_verifier(verifier):
+    global _verifier
+    _verifier = verifier
+
+
+def _run_verifier(name_document):
+    return _verifier._verify_document(name_document)
@@ -16,8 +16,9 @@ def billing_reference(xmldocument: str, klass: form.BillingReference) -> form.Bi
     
     fachoxml = fe_from_string(xmldocument)
     
-    uid = fachoxml.get_element_text('./cbc:ID')
-    uuid = fachoxml.get_element_text('./cbc:UUID')
-    issue_date = fachoxml.get_element_text('./cbc:IssueDate')
+    values = fachoxml.extract(['./cbc:ID', './cbc:UUID', './cbc:IssueDate'], raise_on_fail=True)
+    uid = values['./cbc:ID']
+    uuid = values['./cbc:UUID']
+    issue_date = values['./cbc:IssueDate']
     date = datetime.strptime(issue_date, '%Y-%m-%d')
     return klass(ident=uid, uuid=uuid, date=date)
@@ -3,6 +3,9 @@ from ..form import *
 
 __all__ = ['DIANInvoiceXML']
 
+# esqueletos por etiqueta del documento, ver DIANInvoiceXML.skeleton
+_skeletons = {}
+
 class DIANInvoiceXML(fe.FeXML):
     """
     DianInvoiceXML mapea objeto form.Invoice a XML segun
@@ -10,19 +13,29 @@ class DIANInvoiceXML(fe.FeXML):
     """
 
     def __init__(self, invoice, tag_document = 'Invoice'):
-        super().__init__(tag_document, 'http://www.dian.gov.co/contratos/facturaelectronica/v1')
-        self.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:InvoiceControl')
-        self.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:InvoiceSource')
-        self.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:SoftwareProvider')
-        self.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:SoftwareSecurityCode')
-        self.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:AuthorizationProvider/sts:AuthorizationProviderID')
-        
-        # ZE02 se requiere existencia para firmar
-        ublextension = self.fragment('./ext:UBLExtensions/ext:UBLExtension', append=True)
-        extcontent = ublextension.find_or_create_element('/ext:UBLExtension/ext:ExtensionContent')
+        # el esqueleto se construye una vez por proceso y se copia
+        skeleton = _skeletons.get(tag_document)
+        if skeleton is None:
+            skeleton = _skeletons[tag_document] = self.skeleton(tag_document)
+        skeleton.clone(self)
+
         self.attach_invoice(invoice)
         self.post_attach_invoice(invoice)
 
+    @classmethod
+    def skeleton(cls, tag_document):
+        fexml = fe.FeXML(tag_document, 'http://www.dian.gov.co/contratos/facturaelectronica/v1')
+        fexml.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:InvoiceControl')
+        fexml.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:InvoiceSource')
+        fexml.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:SoftwareProvider')
+        fexml.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:SoftwareSecurityCode')
+        fexml.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent/sts:DianExtensions/sts:AuthorizationProvider/sts:AuthorizationProviderID')
+
+        # ZE02 se requiere existencia para firmar
+        ublextension = fexml.fragment('./ext:UBLExtensions/ext:UBLExtension', append=True)
+        extcontent = ublextension.find_or_create_element('/ext:UBLExtension/ext:ExtensionContent')
+        return fexml
+
     def set_supplier(fexml, invoice):
         fexml.placeholder_for('./cac:AccountingSupplierParty')
 
@@ -138,10 +138,12 @@ class Proveedor:
                                 )
 
     def post_apply(self, fexml, scopexml, fragment):
-        cune_xpath = scopexml.xpath_from_root('/InformacionGeneral')
-        cune = fexml.get_element_attribute(cune_xpath, 'CUNE')
-        
-        ambiente = fexml.get_element_attribute(scopexml.xpath_from_root('/InformacionGeneral'), 'Ambiente')
+        cune_xpath = scopexml.xpath_from_root('/InformacionGeneral/@CUNE')
+        ambiente_xpath = scopexml.xpath_from_root('/InformacionGeneral/@Ambiente')
+        values = fexml.extract([cune_xpath, ambiente_xpath], raise_on_fail=True)
+        cune = values[cune_xpath]
+        ambiente = values[ambiente_xpath]
+
         codigo_qr = f"https://catalogo-vpfe.dian.gov.co/document/searchqr?documentkey={cune}"
 
         if InformacionGeneral.AMBIENTE_PRUEBAS == ambiente:
@@ -330,51 +332,78 @@ class InformacionGeneral:
 
 class DianXMLExtensionSigner(fe.DianXMLExtensionSigner):
 
-    def __init__(self, pkcs12_path, passphrase=None, localpolicy=True):
-        super().__init__(pkcs12_path, passphrase=passphrase, localpolicy=localpolicy)
+    def __init__(self, pkcs12_path, passphrase=None, localpolicy=True, verify_after_sign=True, policy=None):
+        super().__init__(pkcs12_path, passphrase=passphrase, localpolicy=localpolicy,
+                         verify_after_sign=verify_after_sign, policy=policy)
 
     def _element_extension_content(self, fachoxml):
         return fachoxml.builder.xpath(fachoxml.root, './ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent')
 
 
+# esqueletos por tipo de documento, ver DIANNominaXML.skeleton
+_skeletons = {}
+
+
 class DIANNominaXML:
     def __init__(self, tag_document, xpath_ajuste=None, schemaLocation=None, namespace_ajuste=None):
         self.informacion_general_version = None
 
         self.tag_document = tag_document
 
+        # el esqueleto se construye una vez por proceso y se copia
+        key = (tag_document, xpath_ajuste, schemaLocation, namespace_ajuste)
+        skeleton = _skeletons.get(key)
+        if skeleton is None:
+            skeleton = _skeletons[key] = self.skeleton(*key)
+        self.fexml = skeleton.clone()
+        self._fragments(xpath_ajuste, namespace_ajuste)
+
+        self.informacion_general = None
+        self.metadata = None
+
+    @classmethod
+    def skeleton(cls, tag_document, xpath_ajuste=None, schemaLocation=None, namespace_ajuste=None):
+        attributes = [('SchemaLocation', ''), ('xsi:schemaLocation', schemaLocation)]
         if namespace_ajuste:
-            self.fexml = fe.FeXML(tag_document, namespace_ajuste)
+            fexml = fe.FeXML(tag_document, namespace_ajuste, attributes)
         else:
-            self.fexml = fe.FeXML(tag_document, 'dian:gov:co:facturaelectronica:NominaIndividual')
-
-        self.fexml.root.set("SchemaLocation", "")
-        self.fexml.root.set("schemaLocation", schemaLocation)
+            fexml = fe.FeXML(tag_document, 'dian:gov:co:facturaelectronica:NominaIndividual', attributes)
 
         # layout, la dian requiere que los elementos
         # esten ordenados segun el anexo tecnico
-        self.fexml.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent')
-        self.fexml.placeholder_for('./TipoNota', optional=True)
+        fexml.placeholder_for('./ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent')
+        fexml.placeholder_for('./TipoNota', optional=True)
 
+        root_fragment = fexml
+        if xpath_ajuste is not None:
+            root_fragment = fexml.fragment(xpath_ajuste)
+        root_fragment.placeholder_for('./ReemplazandoPredecesor', optional=True)
+        root_fragment.placeholder_for('./EliminandoPredecesor', optional=True)
+        if not namespace_ajuste:
+            root_fragment.placeholder_for('./Novedad', optional=False)
+        root_fragment.placeholder_for('./Periodo')
+        root_fragment.placeholder_for('./NumeroSecuenciaXML')
+        root_fragment.placeholder_for('./LugarGeneracionXML')
+        root_fragment.placeholder_for('./ProveedorXML')
+        root_fragment.placeholder_for('./CodigoQR')
+        root_fragment.placeholder_for('./InformacionGeneral')
+        root_fragment.placeholder_for('./Empleador')
+        root_fragment.placeholder_for('./Trabajador')
+        root_fragment.placeholder_for('./Pago')
+        root_fragment.placeholder_for('./FechasPagos')
+        root_fragment.placeholder_for('./Devengados/Basico')
+        root_fragment.placeholder_for('./Devengados/Transporte', optional=True)
+
+        # los fragmentos marcan como poblados sus placeholders
+        nomina = cls.__new__(cls)
+        nomina.fexml = fexml
+        nomina._fragments(xpath_ajuste, namespace_ajuste)
+        return fexml
+
+    def _fragments(self, xpath_ajuste, namespace_ajuste):
         self.root_fragment = self.fexml
         if xpath_ajuste is not None:
             self.root_fragment = self.fexml.fragment(xpath_ajuste)
-        self.root_fragment.placeholder_for('./ReemplazandoPredecesor', optional=True)
-        self.root_fragment.placeholder_for('./EliminandoPredecesor', optional=True)
-        if not namespace_ajuste:
-            self.root_fragment.placeholder_for('./Novedad', optional=False)
-        self.root_fragment.placeholder_for('./Periodo')
-        self.root_fragment.placeholder_for('./NumeroSecuenciaXML')
-        self.root_fragment.placeholder_for('./LugarGeneracionXML')
-        self.root_fragment.placeholder_for('./ProveedorXML')
-        self.root_fragment.placeholder_for('./CodigoQR')
-        self.root_fragment.placeholder_for('./InformacionGeneral')
-        self.root_fragment.placeholder_for('./Empleador')
-        self.root_fragment.placeholder_for('./Trabajador')
-        self.root_fragment.placeholder_for('./Pago')
-        self.root_fragment.placeholder_for('./FechasPagos')
-        self.root_fragment.placeholder_for('./Devengados/Basico')
-        self.root_fragment.placeholder_for('./Devengados/Transporte', optional=True)
         if not namespace_ajuste:
             self.novedad = self.root_fragment.fragment('./Novedad')
         else:
@@ -391,8 +420,6 @@ class DIANNominaXML:
         self.devengados = self.root_fragment.fragment('./Devengados')
         self.deducciones = self.root_fragment.fragment('./Deducciones')
 
-        self.informacion_general = None
-        self.metadata = None
 
     def asignar_metadata(self, metadata):
         if not isinstance(metadata, Metadata):
@@ -454,13 +481,21 @@ class DIANNominaXML:
         """
         errors = []
 
-        def check_element(xpath, msg):
-            if not self.fexml.exist_element(xpath):
+        # un solo recorrido para todos los elementos requeridos
+        periodo, pago, basico, salud, fondo_pension = self.fexml.find_elements([
+            self.fexml.xpath_from_root('/Periodo'),
+            self.fexml.xpath_from_root('/Pago'),
+            self.fexml.xpath_from_root('/Devengados/Basico'),
+            self.fexml.xpath_from_root('/Deducciones/Salud'),
+            self.fexml.xpath_from_root('/Deducciones/FondoPension'),
+        ])
+
+        def check_element(elem, msg):
+            if not self.fexml.is_populated(elem):
                 errors.append(DIANNominaIndividualError(msg))
 
-        def check_attribute(xpath, key, msg):
+        def check_attribute(elem, key, msg):
             err = DIANNominaIndividualError(msg)
-            elem = self.fexml.get_element(xpath)
 
             if elem is None:
                 return errors.append(err)
@@ -469,27 +504,27 @@ class DIANNominaXML:
                 return errors.append(err)
 
         check_attribute(
-            self.fexml.xpath_from_root('/Periodo'),
+            periodo,
             'FechaIngreso',
             'se requiere Periodo')
 
         check_element(
-            self.fexml.xpath_from_root('/Pago'),
+            pago,
             'se requiere Pago'
         )
 
         check_element(
-            self.fexml.xpath_from_root('/Devengados/Basico'),
+            basico,
             'se requiere DevengadoBasico'
         )
         
         check_element(
-            self.fexml.xpath_from_root('/Deducciones/Salud'),
+            salud,
             'se requiere DeduccionSalud'
         )
 
         check_element(
-            self.fexml.xpath_from_root('/Deducciones/FondoPension'),
+            fondo_pension,
             'se requiere DeduccionFondoPension'
         )
 
@@ -17,17 +17,16 @@ class Habilitacion:
 
     def generar(self, zipname, fecha):
         nominas = []
-        dianzip = fe.DianZIP(open(zipname, 'w'))
-
-        fechabase = datetime.datetime.now()
-        consecutivo = 0
-        for _ in range(1, 11):
-            consecutivo += 1
-            fechabase += datetime.timedelta(days=1)
-            nomina = self._crear_nomina_individual()
-
-            # pag 96
-            nombre = "nie%010d%s%08x.xml" % (int(self.nit), fecha.strftime('%s'), consecutivo)
+        with fe.DianZIP(zipname) as dianzip:
+            fechabase = datetime.datetime.now()
+            consecutivo = 0
+            for _ in range(1, 11):
+                consecutivo += 1
+                fechabase += datetime.timedelta(days=1)
+                nomina = self._crear_nomina_individual()
+
+                # pag 96
+                nombre = "nie%010d%s%08x.xml" % (int(self.nit), fecha.strftime('%s'), consecutivo)
         
     def _crear_nomina_individual_reemplazar(self, nomina, fechabase):
         metadata = self.metadata
@@ -0,0 +1,388 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+envio de documentos a la DIAN en flujo continuo.
+
+  especificacion -> documento firmado -> ZIP (50) -> SendBillAsync -> GetStatusZip
+
+la construccion y firma se reparten en un grupo de procesos, el envio
+y la consulta de estado usan AsyncDianClient; cada etapa se comunica
+por colas acotadas de modo que una etapa lenta frena a las anteriores.
+
+el avance se registra en un Journal (SQLite), al ejecutar de nuevo con
+las mismas especificaciones se omiten los documentos ya enviados y se
+retoma la consulta de los ZIP pendientes.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import os
+import sqlite3
+import time
+import traceback
+
+from .batch import SpecError
+from .pool import init_worker, run_worker
+from .client import dian
+from .client.dian_async import AsyncDianClient
+from .fe import DianZIP, dian_zips
+
+__all__ = ['Journal', 'SubmissionPipeline', 'PipelineReport']
+
+
+# StatusCode de la DIAN mientras el ZIP esta en proceso de validacion
+STATUS_IN_PROCESS = '98'
+
+
+class Journal:
+    """
+    estado del envio en SQLite.
+
+    batches: un registro por ZIP (pending, submitted, accepted, rejected, failed)
+    documents: documento -> ZIP donde se envio
+    """
+
+    SENT = ('submitted', 'accepted', 'rejected')
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT,
+                zip_key TEXT,
+                state TEXT NOT NULL,
+                status_code TEXT,
+                status_description TEXT,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                ident TEXT PRIMARY KEY,
+                filename TEXT,
+                batch_id INTEGER REFERENCES batches(id)
+            );
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def sent_idents(self):
+        cursor = self.conn.execute(
+            'SELECT d.ident FROM documents d JOIN batches b ON b.id = d.batch_id'
+            ' WHERE b.state IN (?, ?, ?)', self.SENT)
+        return {ident for ident, in cursor}
+
+    def batch_created(self, documents):
+        """
+        @param documents [(ident, nombre en el ZIP)]
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO batches (state) VALUES (?)', ('pending',))
+            batch_id = cursor.lastrowid
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO documents (ident, filename, batch_id) VALUES (?, ?, ?)',
+                [(ident, name, batch_id) for ident, name in documents])
+        return batch_id
+
+    def batch_submitted(self, batch_id, filename, zip_key):
+        with self.conn:
+            self.conn.execute('UPDATE batches SET state = ?, filename = ?, zip_key = ? WHERE id = ?',
+                              ('submitted', filename, zip_key, batch_id))
+
+    def batch_finished(self, batch_id, valid, status_code, status_description):
+        with self.conn:
+            self.conn.execute(
+                'UPDATE batches SET state = ?, status_code = ?, status_description = ? WHERE id = ?',
+                ('accepted' if valid else 'rejected', status_code, status_description, batch_id))
+
+    def batch_failed(self, batch_id, error):
+        with self.conn:
+            self.conn.execute('UPDATE batches SET state = ?, error = ? WHERE id = ?',
+                              ('failed', error, batch_id))
+
+    def batch_error(self, batch_id, error):
+        # el estado no cambia, ej: fallo al consultar un ZIP ya enviado
+        with self.conn:
+            self.conn.execute('UPDATE batches SET error = ? WHERE id = ?', (error, batch_id))
+
+    def submitted_batches(self):
+        """
+        ZIP enviados sin estado final, [(id, zip_key)]
+        """
+        return list(self.conn.execute(
+            "SELECT id, zip_key FROM batches WHERE state = 'submitted' ORDER BY id"))
+
+    def batch_states(self):
+        return dict(self.conn.execute('SELECT state, COUNT(*) FROM batches GROUP BY state'))
+
+    def document_states(self):
+        return dict(self.conn.execute(
+            'SELECT b.state, COUNT(*) FROM documents d JOIN batches b ON b.id = d.batch_id'
+            ' GROUP BY b.state'))
+
+
+@dataclass
+class PipelineReport:
+    # documentos construidos y firmados en esta ejecucion
+    documents: int = 0
+    # documentos omitidos por estar ya enviados
+    skipped: int = 0
+    batches: int = 0
+    # (posicion de la especificacion, traceback)
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def __str__(self):
+        return "documents: %d skipped: %d failed: %d batches: %d elapsed: %.2fs" % (
+            self.documents, self.skipped, len(self.errors), self.batches, self.elapsed)
+
+
+@dataclass
+class _Signed:
+    index: int
+    ident: str = None
+    content: bytes = None
+    skipped: bool = False
+    error: str = None
+
+
+class _SignWorker:
+
+    def __init__(self, builder, signer, output_dir, skip):
+        self.builder = builder
+        self.signer = signer
+        self.output_dir = output_dir
+        self.skip = skip
+
+    def __call__(self, job):
+        index, spec = job
+        if isinstance(spec, SpecError):
+            return _Signed(index, error=spec.error)
+        try:
+            return self.sign(index, spec)
+        except Exception:
+            return _Signed(index, error=traceback.format_exc())
+
+    def sign(self, index, spec):
+        invoice = self.builder.invoice(spec)
+        ident = invoice.invoice_ident
+        if ident in self.skip:
+            return _Signed(index, ident, skipped=True)
+
+        invoice.calculate()
+        xml = self.builder.document_xml()(invoice)
+        for extension in self.builder.extensions(invoice):
+            xml.add_extension(extension)
+
+        if self.signer is None:
+            document = xml.tostring(xml_declaration=True, encoding='UTF-8')
+        else:
+            document = self.signer.sign_fachoxml(xml)
+        content = document.encode('utf-8')
+
+        if self.output_dir is not None:
+            with open(os.path.join(self.output_dir, self.builder.filename(invoice)), 'wb') as f:
+                f.write(content)
+        return _Signed(index, ident, content)
+
+
+class SubmissionPipeline:
+
+    def __init__(self, builder, signer, gateway, journal,
+                 output_dir=None, processes=None, backlog=4,
+                 concurrency=4, rate=None, retries=3,
+                 poll_interval=5.0, max_polls=120,
+                 test_set_id=None, habilitacion=False,
+                 max_files=DianZIP.MAX_FILES):
+        """
+        @param builder batch.InvoiceBuilder
+        @param signer DianXMLExtensionSigner o None para no firmar
+        @param gateway DianClient o DianSignatureClient
+        @param journal Journal
+        @param output_dir directorio donde guardar los documentos firmados
+        @param processes procesos para construir y firmar
+        @param backlog documentos en vuelo por proceso
+        @param concurrency peticiones simultaneas a la DIAN
+        @param rate maximo de peticiones por segundo
+        @param poll_interval segundos entre consultas de un ZIP en proceso
+        @param max_polls consultas maximas por ZIP
+        @param test_set_id usar SendTestSetAsync con este set de pruebas
+        @param habilitacion usar los servicios de habilitacion
+        """
+        self.builder = builder
+        self.signer = signer
+        self.gateway = gateway
+        self.journal = journal
+        self.output_dir = output_dir
+        self.processes = processes or os.cpu_count() or 1
+        self.backlog = backlog
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.poll_interval = poll_interval
+        self.max_polls = max_polls
+        self.test_set_id = test_set_id
+        self.habilitacion = habilitacion
+        self.max_files = max_files
+        self.report = PipelineReport()
+
+    def _services(self):
+        services = dian.Habilitacion if self.habilitacion else dian
+        return services.SendBillAsync, services.SendTestSetAsync, services.GetStatusZip
+
+    def run(self, specs):
+        """
+        procesa las especificaciones y retorna PipelineReport.
+        """
+        return asyncio.run(self.run_async(specs))
+
+    async def run_async(self, specs):
+        self.report = PipelineReport()
+        start = time.perf_counter()
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+        documents = asyncio.Queue(maxsize=self.processes * self.backlog)
+        batches = asyncio.Queue(maxsize=self.concurrency)
+        polls = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async with AsyncDianClient(self.gateway, concurrency=self.concurrency,
+                                   rate=self.rate, retries=self.retries) as client:
+            submitters = [asyncio.create_task(self._submit(client, batches, polls))
+                          for _ in range(self.concurrency)]
+            pollers = [asyncio.create_task(self._poll(client, polls))
+                       for _ in range(self.concurrency)]
+            # ZIP enviados en una ejecucion anterior, se consultan en
+            # paralelo sin retrasar la construccion de los nuevos
+            resumer = asyncio.create_task(self._resume(self.journal.submitted_batches(), polls))
+            zipper = asyncio.create_task(self._zip(documents, batches))
+            tasks = submitters + pollers + [resumer, zipper]
+            try:
+                await self._build(specs, documents)
+                await zipper
+                for _ in submitters:
+                    await batches.put(None)
+                await asyncio.gather(*submitters)
+                await resumer
+                for _ in pollers:
+                    await polls.put(None)
+                await asyncio.gather(*pollers)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        self.report.elapsed = time.perf_counter() - start
+        return self.report
+
+    def _executor(self, worker):
+        if self.processes == 1:
+            return ThreadPoolExecutor(max_workers=1), worker
+        executor = ProcessPoolExecutor(max_workers=self.processes,
+                                       initializer=init_worker,
+                                       initargs=(worker,))
+        return executor, run_worker
+
+    async def _build(self, specs, documents):
+        loop = asyncio.get_running_loop()
+        worker = _SignWorker(self.builder, self.signer, self.output_dir,
+                             frozenset(self.journal.sent_idents()))
+        executor, run = self._executor(worker)
+        window = self.processes * self.backlog
+
+        async def emit(future):
+            signed = await future
+            if signed.error is not None:
+                self.report.errors.append((signed.index, signed.error))
+            elif signed.skipped:
+                self.report.skipped += 1
+            else:
+                self.report.documents += 1
+                await documents.put(signed)
+
+        with executor:
+            pending = deque()
+            for job in enumerate(specs):
+                pending.append(loop.run_in_executor(executor, run, job))
+                if len(pending) >= window:
+                    await emit(pending.popleft())
+            while pending:
+                await emit(pending.popleft())
+        await documents.put(None)
+
+    async def _resume(self, submitted, polls):
+        for batch in submitted:
+            await polls.put(batch)
+
+    def _zip_documents(self, loop, documents, batches):
+        """
+        archiva con dian_zips los documentos firmados, se ejecuta en
+        un hilo para no detener el loop al comprimir.
+        """
+        def signed_documents():
+            while True:
+                signed = asyncio.run_coroutine_threadsafe(documents.get(), loop).result()
+                if signed is None:
+                    return
+                yield signed.ident, signed.content
+
+        for archive in dian_zips(signed_documents(), self.max_files):
+            asyncio.run_coroutine_threadsafe(self._queue_batch(archive, batches), loop).result()
+
+    async def _queue_batch(self, archive, batches):
+        batch_id = self.journal.batch_created(archive.filenames)
+        self.report.batches += 1
+        await batches.put((batch_id, archive.content))
+
+    async def _zip(self, documents, batches):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._zip_documents, loop, documents, batches)
+
+    async def _submit(self, client, batches, polls):
+        send_bill, send_test_set, _ = self._services()
+        while True:
+            batch = await batches.get()
+            if batch is None:
+                return
+
+            batch_id, content = batch
+            filename = 'facho%08d.zip' % (batch_id)
+            if self.test_set_id is None:
+                service = send_bill(filename, content)
+            else:
+                service = send_test_set(filename, content, self.test_set_id)
+            try:
+                response = await client.request(service)
+                zip_key = response.ZipKey if self.test_set_id is not None else response['ZipKey']
+            except Exception:
+                self.journal.batch_failed(batch_id, traceback.format_exc())
+                continue
+
+            self.journal.batch_submitted(batch_id, filename, zip_key)
+            await polls.put((batch_id, zip_key))
+
+    async def _poll(self, client, polls):
+        _, _, get_status_zip = self._services()
+        while True:
+            batch = await polls.get()
+            if batch is None:
+                return
+
+            batch_id, zip_key = batch
+            for _ in range(self.max_polls):
+                try:
+                    status = await client.request(get_status_zip(zip_key))
+                except Exception:
+                    self.journal.batch_error(batch_id, traceback.format_exc())
+                    break
+
+                if str(status.StatusCode) != STATUS_IN_PROCESS:
+                    self.journal.batch_finished(batch_id, status.IsValid,
+                                                str(status.StatusCode), status.StatusDescription)
+                    break
+                await asyncio.sleep(self.poll_interval)
+            # sin respuesta final queda submitted para la proxima ejecucion
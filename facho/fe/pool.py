@@ -0,0 +1,47 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+utilidades para repartir trabajo en un grupo de procesos.
+"""
+
+from collections import deque
+
+
+def bounded_map(executor, fn, items, window):
+    """
+    como executor.map pero solo mantiene window trabajos en vuelo,
+    los items se consumen a medida que se entregan resultados.
+    retorna generador de resultados en el orden de items.
+
+    @param executor concurrent.futures.Executor
+    @param window cantidad maxima de trabajos enviados sin resultado
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+# trabajador del proceso actual, ver init_worker
+_worker = None
+
+
+def init_worker(worker):
+    """
+    inicializador de ProcessPoolExecutor, instala worker
+    una sola vez por proceso.
+    """
+    global _worker
+    _worker = worker
+
+
+def run_worker(job):
+    """
+    ejecuta job con el trabajador instalado por init_worker.
+    """
+    return _worker(job)
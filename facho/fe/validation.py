@@ -0,0 +1,182 @@
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+"""
+validacion XSD de documentos en lote.
+
+por omision se valida con lxml (libxml2) y solo para los documentos
+invalidos se usa xmlschema para obtener errores detallados.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+import os
+import zipfile
+
+from lxml import etree
+
+from .data.dian import XSD
+from .pool import bounded_map
+
+__all__ = ['ValidationResult', 'iter_documents', 'schema_namespace',
+           'validate_document', 'validate_path', 'report']
+
+
+# espacio de nombres usado por facho en la raiz del documento
+DIAN_NAMESPACE = 'http://www.dian.gov.co/contratos/facturaelectronica/v1'
+
+# etiqueta raiz -> (esquema, espacio de nombres del esquema)
+DOCUMENT_TYPES = {
+    'Invoice': ('UBLInvoice', 'urn:oasis:names:specification:ubl:schema:xsd:Invoice-2'),
+    'CreditNote': ('UBLCreditNote', 'urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2'),
+    'DebitNote': ('UBLDebitNote', 'urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2'),
+    'AttachedDocument': ('UBLAttachedDocument', 'urn:oasis:names:specification:ubl:schema:xsd:AttachedDocument-2'),
+    'NominaIndividual': ('NominaIndividual', 'dian:gov:co:facturaelectronica:NominaIndividual'),
+    'NominaIndividualDeAjuste': ('NominaIndividualDeAjuste', 'dian:gov:co:facturaelectronica:NominaIndividualDeAjuste'),
+}
+
+ENGINES = ['lxml', 'xmlschema']
+
+
+@dataclass
+class ValidationResult:
+    name: str
+    document_type: str = None
+    valid: bool = False
+    errors: list = field(default_factory=list)
+
+
+def iter_documents(path):
+    """
+    retorna (nombre, contenido) de los .xml de un directorio,
+    de un archivo ZIP o de un unico archivo, ordenados por nombre.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zipf:
+            for name in sorted(zipf.namelist()):
+                if name.endswith('.xml'):
+                    yield (name, zipf.read(name))
+    elif os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.xml'):
+                with open(os.path.join(path, name), 'rb') as f:
+                    yield (name, f.read())
+    else:
+        with open(path, 'rb') as f:
+            yield (os.path.basename(path), f.read())
+
+
+def schema_namespace(content, document_type):
+    """
+    reemplaza el espacio de nombres de facho por el del esquema,
+    esto es requerido por el XSD de la DIAN.
+    """
+    namespace = DOCUMENT_TYPES[document_type][1]
+    if isinstance(content, bytes):
+        return content.replace(b'"%s"' % DIAN_NAMESPACE.encode(), b'"%s"' % namespace.encode())
+    return content.replace('"%s"' % DIAN_NAMESPACE, '"%s"' % namespace)
+
+
+def _lxml_errors(schema):
+    return ['line %d: %s' % (error.line, error.message) for error in schema.error_log]
+
+
+def _xmlschema_errors(schema_name, document):
+    errors = []
+    for error in XSD.schema(schema_name).iter_errors(document):
+        if error.path:
+            errors.append('%s: %s' % (error.path, error.reason))
+        else:
+            errors.append(str(error.reason))
+    return errors
+
+
+def validate_document(content, name=None, engine='lxml', detailed=True):
+    """
+    valida el documento contra el esquema segun la etiqueta raiz.
+
+    @param content bytes del documento
+    @param engine 'lxml' o 'xmlschema'
+    @param detailed con lxml, usar xmlschema para detallar los errores
+    """
+    if engine not in ENGINES:
+        raise ValueError('engine must be one of %s' % (ENGINES))
+    result = ValidationResult(name)
+
+    try:
+        document = etree.fromstring(content)
+        qname = etree.QName(document)
+        if qname.localname not in DOCUMENT_TYPES:
+            result.errors.append('unknown document type %s' % (qname.localname))
+            return result
+        result.document_type = qname.localname
+        if qname.namespace == DIAN_NAMESPACE:
+            document = etree.fromstring(schema_namespace(content, qname.localname))
+    except etree.XMLSyntaxError as e:
+        result.errors.append(str(e))
+        return result
+
+    schema_name = DOCUMENT_TYPES[result.document_type][0]
+    if engine == 'lxml':
+        try:
+            schema = XSD.lxml_schema(schema_name)
+        except etree.XMLSchemaParseError:
+            # libxml2 no soporta el esquema, se usa xmlschema
+            schema = None
+        if schema is not None:
+            result.valid = schema.validate(document)
+            if not result.valid:
+                result.errors = _lxml_errors(schema)
+                if detailed:
+                    result.errors = _xmlschema_errors(schema_name, document) or result.errors
+            return result
+
+    result.errors = _xmlschema_errors(schema_name, document)
+    result.valid = not result.errors
+    return result
+
+
+class _Validator:
+
+    def __init__(self, engine, detailed):
+        self.engine = engine
+        self.detailed = detailed
+
+    def __call__(self, name_document):
+        name, document = name_document
+        try:
+            return validate_document(document, name, self.engine, self.detailed)
+        except Exception as e:
+            return ValidationResult(name, errors=[repr(e)])
+
+
+def validate_path(path, processes=None, engine='lxml', detailed=True, backlog=4):
+    """
+    valida los documentos .xml de un directorio o archivo ZIP.
+    retorna lista de ValidationResult ordenada por nombre.
+
+    @param processes cantidad de procesos, 1 valida en el proceso actual
+    @param backlog documentos en vuelo por proceso
+    """
+    validator = _Validator(engine, detailed)
+    documents = iter_documents(path)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        return list(map(validator, documents))
+
+    # los documentos se leen a medida que los procesos avanzan
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(bounded_map(executor, validator, documents, processes * backlog))
+
+
+def report(results):
+    """
+    retorna resumen serializable como JSON.
+    """
+    valid = sum(1 for result in results if result.valid)
+    return {
+        'documents': len(results),
+        'valid': valid,
+        'invalid': len(results) - valid,
+        'results': [asdict(result) for result in results],
+    }
@@ -144,3 +144,25 @@ def simple_invoice():
         )
     ))
     return inv
+
+@pytest.fixture
+def fixed_signature(monkeypatch):
+    # firmas reproducibles: identificadores y hora de firma fijos
+    import uuid
+    import xades
+    from facho.fe import fe
+
+    ids = iter(range(1000))
+    monkeypatch.setattr(fe.uuid, 'uuid4', lambda: uuid.UUID(int=next(ids)))
+    monkeypatch.setattr(xades.utils, 'uuid4', lambda: uuid.UUID(int=next(ids)))
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2021, 5, 3, 10, 11, 12)
+    monkeypatch.setattr(fe, 'datetime', FixedDatetime)
+
+    def reset():
+        nonlocal ids
+        ids = iter(range(1000))
+    return reset
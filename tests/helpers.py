@@ -0,0 +1,24 @@
+import copy
+
+from lxml import etree
+
+from facho.facho import LXMLBuilder
+from facho.fe import fe
+
+
+def legacy_fexml_tostring(xml, **kw):
+    # FeXML.tostring anterior: raiz con prefijo y reescritura del documento serializado
+    root = etree.Element(xml.root.tag, nsmap=fe.NAMESPACES)
+    for key, value in xml.root.attrib.items():
+        if key == '{%s}schemaLocation' % (fe.NAMESPACES['xsi']):
+            key = 'schemaLocation'
+        root.set(key, value)
+    with xml.builder._without_optionals(xml.root, xml._optionals()):
+        root.extend(copy.deepcopy(child) for child in xml.root)
+
+    root_namespace = xml.root_namespace()
+    xmlns_name = {v: k for k, v in fe.NAMESPACES.items()}[root_namespace]
+    return LXMLBuilder.tostring(root, **kw)\
+        .replace(xmlns_name + ':', '')\
+        .replace('xmlns:'+xmlns_name, 'xmlns')\
+        .replace('schemaLocation', 'xsi:schemaLocation')
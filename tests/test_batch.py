@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+import io
+import os
+from datetime import datetime
+
+import pytest
+
+from facho import fe
+import facho.fe.form as form
+from facho.fe import batch
+
+
+class SpecBuilder(batch.InvoiceBuilder):
+
+    def invoice(self, spec):
+        party = form.Party(
+            name = 'facho-party',
+            ident = form.PartyIdentification('123','', '31'),
+            responsability_code = form.Responsability(['O-07']),
+            responsability_regime_code = '48',
+            organization_code = '1',
+            address = form.Address(
+                '', '', form.City('05001', 'Medellín'),
+                form.Country('CO', 'Colombia'),
+                form.CountrySubentity('05', 'Antioquia'))
+        )
+        issue = datetime(2021, 5, 3)
+        inv = form.NationalSalesInvoice()
+        inv.set_period(issue, issue)
+        inv.set_issue(issue)
+        inv.set_ident(spec['ident'])
+        inv.set_operation_type(spec.get('operation_type', '10'))
+        inv.set_payment_mean(form.PaymentMean(form.PaymentMean.DEBIT, '41', issue, '1234'))
+        inv.set_supplier(party)
+        inv.set_customer(party)
+        inv.add_invoice_line(form.InvoiceLine(
+            quantity = form.Quantity(1, '94'),
+            description = 'producto facho',
+            item = form.StandardItem(9999),
+            price = form.Price(form.Amount(spec['price']), '01', ''),
+            tax = form.TaxTotal(subtotals = [form.TaxSubTotal(percent = 19.0)])
+        ))
+        return inv
+
+    def extensions(self, invoice):
+        return [fe.DianXMLExtensionCUFE(invoice, clave_tecnica='clave')]
+
+
+def specs(count):
+    return [{'ident': 'SETP%d' % (i), 'price': 100.0 + i} for i in range(count)]
+
+
+def test_batch_read_specs():
+    stream = io.StringIO('{"ident": "A1", "price": 1}\n\n{"ident": "A2", "price": 2}\n')
+    assert list(batch.read_specs(stream)) == [
+        {'ident': 'A1', 'price': 1},
+        {'ident': 'A2', 'price': 2},
+    ]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batch_invalid_spec_line(tmpdir, processes):
+    stream = io.StringIO('{"ident": "A1", "price": 1}\n{"ident": \n{"ident": "A3", "price": 3}\n')
+
+    generator = batch.InvoiceBatch(SpecBuilder(), str(tmpdir), processes=processes)
+    results = list(generator.run(batch.read_specs(stream)))
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].error.startswith('line 2:')
+    assert os.path.exists(os.path.join(str(tmpdir), 'A3.xml'))
+    assert generator.report.documents == 3
+    assert generator.report.failed == 1
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batch_generate_ordered(tmpdir, processes):
+    generator = batch.InvoiceBatch(SpecBuilder(), str(tmpdir), processes=processes)
+    results = list(generator.run(specs(5)))
+
+    assert [result.index for result in results] == list(range(5))
+    assert all(result.ok for result in results)
+    for i, result in enumerate(results):
+        assert result.filename == os.path.join(str(tmpdir), 'SETP%d.xml' % (i))
+        content = open(result.filename).read()
+        assert '<cbc:ID>SETP%d</cbc:ID>' % (i) in content
+        assert 'schemeName="CUFE-SHA384"' in content
+    assert generator.report.documents == 5
+    assert generator.report.failed == 0
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batch_capture_error(tmpdir, processes):
+    items = specs(3)
+    items[1]['operation_type'] = 'invalid'
+
+    generator = batch.InvoiceBatch(SpecBuilder(), str(tmpdir), processes=processes)
+    results = list(generator.run(items))
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].filename is None
+    assert 'operation' in results[1].error
+    assert generator.report.documents == 3
+    assert generator.report.failed == 1
+
+
+def test_batch_generate_signed(tmpdir):
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    generator = batch.InvoiceBatch(SpecBuilder(), str(tmpdir), signer=signer, processes=2)
+    results = list(generator.run(specs(2)))
+
+    assert all(result.ok for result in results)
+    for result in results:
+        assert '<ds:SignatureValue' in open(result.filename).read()
+
+
+def test_batch_script_builder(tmpdir):
+    script = tmpdir.join('script.py')
+    script.write(
+        'from test_batch import SpecBuilder\n'
+        'builder = SpecBuilder()\n'
+        'def invoice(spec):\n'
+        '    return builder.invoice(spec)\n'
+        'def extensions(invoice):\n'
+        '    return builder.extensions(invoice)\n'
+    )
+
+    generator = batch.InvoiceBatch(batch.ScriptInvoiceBuilder(str(script)),
+                                   str(tmpdir.join('out')), processes=2)
+    results = list(generator.run(specs(3)))
+
+    assert all(result.ok for result in results)
+    assert sorted(os.listdir(str(tmpdir.join('out')))) == ['SETP0.xml', 'SETP1.xml', 'SETP2.xml']
+
+
+def test_bounded_map_window():
+    from concurrent.futures import ThreadPoolExecutor
+    from facho.fe.pool import bounded_map
+
+    consumed = []
+    def items():
+        for index in range(10):
+            consumed.append(index)
+            yield index
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = bounded_map(executor, lambda x: x * 2, items(), 3)
+        assert next(results) == 0
+        assert consumed == [0, 1, 2]
+        assert list(results) == [2 * index for index in range(1, 10)]
@@ -4,8 +4,17 @@
 # this repository contains the full copyright notices and license terms.
 
 from facho.fe.client import dian
+from facho.fe.client.dian_async import AsyncDianClient
+from facho.fe.client.wsse import signature
 from facho import facho
 
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
+
 import pytest
 
 
@@ -38,3 +47,236 @@ def test_sopa_consultaresolucionesfacturacion():
         '860046645', '800037646', '13a6a789-47ca-4728-adb8-372fca76e692'
     ))
     assert len(resp.NumberRangeResponse) == 1
+
+
+WSDL = '''<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/"
+                  xmlns:soap12="http://schemas.xmlsoap.org/wsdl/soap12/"
+                  xmlns:xs="http://www.w3.org/2001/XMLSchema"
+                  xmlns:tns="http://wcf.dian.colombia"
+                  targetNamespace="http://wcf.dian.colombia">
+  <wsdl:types>
+    <xs:schema elementFormDefault="qualified" targetNamespace="http://wcf.dian.colombia">
+      <xs:element name="GetStatus">
+        <xs:complexType><xs:sequence><xs:element name="trackId" type="xs:string"/></xs:sequence></xs:complexType>
+      </xs:element>
+      <xs:element name="GetStatusResponse">
+        <xs:complexType><xs:sequence><xs:element name="GetStatusResult" type="xs:string"/></xs:sequence></xs:complexType>
+      </xs:element>
+    </xs:schema>
+  </wsdl:types>
+  <wsdl:message name="GetStatusRequest"><wsdl:part name="parameters" element="tns:GetStatus"/></wsdl:message>
+  <wsdl:message name="GetStatusResponse"><wsdl:part name="parameters" element="tns:GetStatusResponse"/></wsdl:message>
+  <wsdl:portType name="IWcfDianCustomerServices">
+    <wsdl:operation name="GetStatus">
+      <wsdl:input message="tns:GetStatusRequest"/>
+      <wsdl:output message="tns:GetStatusResponse"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="WSHttpBinding_IWcfDianCustomerServices" type="tns:IWcfDianCustomerServices">
+    <soap12:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="GetStatus">
+      <soap12:operation soapAction="http://wcf.dian.colombia/IWcfDianCustomerServices/GetStatus" style="document"/>
+      <wsdl:input><soap12:body use="literal"/></wsdl:input>
+      <wsdl:output><soap12:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="WcfDianCustomerServices">
+    <wsdl:port name="WSHttpBinding_IWcfDianCustomerServices" binding="tns:WSHttpBinding_IWcfDianCustomerServices">
+      <soap12:address location="http://localhost/WcfDianCustomerServices.svc"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+'''
+
+
+@pytest.fixture
+def wsdl_path(tmpdir, monkeypatch):
+    monkeypatch.setattr(dian, 'WSDL_CACHE_PATH', str(tmpdir.join('cache', 'wsdl.sqlite')))
+    path = tmpdir.join('dian.wsdl')
+    path.write(WSDL)
+    return str(path)
+
+
+def local_service(wsdl):
+    class LocalGetStatus(dian.GetStatus):
+        def wsdl(self):
+            return wsdl
+    return LocalGetStatus('123')
+
+
+def test_dian_client_reused(wsdl_path, tmpdir):
+    client_dian = dian.DianClient('user', 'pass')
+    service = local_service(wsdl_path)
+
+    client = client_dian._open(service)
+    assert client_dian._open(service) is client
+    assert client.wsse.username == 'user'
+    assert isinstance(client.transport.cache, dian.SqliteCache)
+    assert tmpdir.join('cache', 'wsdl.sqlite').check()
+
+    other_path = tmpdir.join('other.wsdl')
+    other_path.write(WSDL)
+    other = client_dian._open(local_service(str(other_path)))
+    assert other is not client
+    # la sesion HTTP se comparte entre clientes
+    assert other.transport is client.transport
+    adapter = client.transport.session.get_adapter('https://vpfe.dian.gov.co')
+    assert adapter._pool_maxsize == dian.POOL_MAXSIZE
+
+
+def test_dian_signature_client_threads(wsdl_path):
+    client_dian = dian.DianSignatureClient('./tests/example.key', './tests/example.pem')
+    service = local_service(wsdl_path)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        clients = list(executor.map(lambda _: client_dian._open(service), range(8)))
+    assert all(client is clients[0] for client in clients)
+
+
+def test_dian_client_cache_fallback(wsdl_path, monkeypatch, tmpdir):
+    blocked = tmpdir.join('blocked')
+    blocked.write('')
+    monkeypatch.setattr(dian, 'WSDL_CACHE_PATH', str(blocked.join('wsdl.sqlite')))
+
+    client = dian.DianClient('user', 'pass')._open(local_service(wsdl_path))
+    assert isinstance(client.transport.cache, dian.InMemoryCache)
+
+
+class FakeStatusGateway(dian.DianGateway):
+
+    def __init__(self, failures=0, delay=0.01):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def request(self, service):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            fail = self.failures > 0
+            if fail:
+                self.failures -= 1
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise ConnectionError('dian no responde')
+            if service.trackId == 'fault':
+                raise ValueError('track id invalido')
+            return (service.service(), service.trackId)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_async_gather_status_ordered_and_bounded():
+
+    gateway = FakeStatusGateway()
+    track_ids = ['track%d' % (i) for i in range(20)]
+
+    async def run():
+        async with AsyncDianClient(gateway, concurrency=3) as client:
+            return await client.gather_status(track_ids)
+
+    responses = asyncio.run(run())
+    assert responses == [('GetStatus', track_id) for track_id in track_ids]
+    assert gateway.max_running == 3
+
+
+def test_async_gather_status_zip_and_errors():
+
+    gateway = FakeStatusGateway()
+
+    async def run():
+        async with AsyncDianClient(gateway) as client:
+            return await client.gather_status(['a', 'fault'], service=dian.Habilitacion.GetStatusZip)
+
+    ok, error = asyncio.run(run())
+    assert ok == ('GetStatusZip', 'a')
+    assert isinstance(error, ValueError)
+    # errores que no son de red no se reintentan
+    assert gateway.calls == 2
+
+
+def test_async_retry_backoff():
+
+    async def run(gateway, retries):
+        async with AsyncDianClient(gateway, retries=retries, backoff=0.001) as client:
+            return await client.gather_status(['a'])
+
+    gateway = FakeStatusGateway(failures=2)
+    assert asyncio.run(run(gateway, 2)) == [('GetStatus', 'a')]
+    assert gateway.calls == 3
+
+    gateway = FakeStatusGateway(failures=2)
+    [error] = asyncio.run(run(gateway, 1))
+    assert isinstance(error, ConnectionError)
+    assert gateway.calls == 2
+
+
+def test_async_rate_limit():
+
+    gateway = FakeStatusGateway(delay=0)
+
+    async def run():
+        async with AsyncDianClient(gateway, concurrency=10, rate=100) as client:
+            return await client.gather_status(['track%d' % (i) for i in range(11)])
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - start >= 0.1
+
+
+def test_wsse_sign_key_cached(tmpdir):
+    key_file = tmpdir.join('example.key')
+    certfile = tmpdir.join('example.pem')
+    key_file.write(open('./tests/example.key', 'rb').read(), mode='wb')
+    certfile.write(open('./tests/example.pem', 'rb').read(), mode='wb')
+
+    key = signature.load_sign_key(str(key_file), str(certfile))
+    assert signature.load_sign_key(str(key_file), str(certfile)) is key
+
+    # la llave se recarga al cambiar el archivo
+    key_file.setmtime(key_file.mtime() + 10)
+    reloaded = signature.load_sign_key(str(key_file), str(certfile))
+    assert reloaded is not key
+    assert signature.load_sign_key(str(key_file), str(certfile)) is reloaded
+    assert len([k for k in signature._sign_keys if k[0] == str(key_file)]) == 1
+
+
+def test_wsse_binary_signature_shared(monkeypatch):
+    envelope = '''<soap:Envelope xmlns:soap="http://www.w3.org/2003/05/soap-envelope" xmlns:wsa="http://www.w3.org/2005/08/addressing">
+      <soap:Header><wsa:To>https://vpfe-hab.dian.gov.co/WcfDianCustomerServices.svc</wsa:To></soap:Header>
+      <soap:Body/>
+    </soap:Envelope>'''
+
+    client_dian = dian.DianSignatureClient('./tests/example.key', './tests/example.pem')
+    wsse = client_dian._wsse()
+    assert client_dian._wsse() is wsse
+
+    loaded = []
+    make_sign_key = signature._make_sign_key
+    monkeypatch.setattr(signature, '_sign_keys', {})
+    monkeypatch.setattr(signature, '_make_sign_key', lambda *args: loaded.append(1) or make_sign_key(*args))
+    for _ in range(2):
+        signed, _ = wsse.apply(etree.fromstring(envelope), {})
+        signature.verify_envelope(signed, './tests/example.pem')
+    assert loaded == [1]
+
+
+def test_async_client_reused_across_event_loops():
+
+    gateway = FakeStatusGateway()
+    client = AsyncDianClient(gateway, concurrency=2, rate=100)
+    track_ids = ['track%d' % (i) for i in range(4)]
+
+    try:
+        # cada asyncio.run crea un loop nuevo
+        for _ in range(2):
+            responses = asyncio.run(client.gather_status(track_ids))
+            assert responses == [('GetStatus', track_id) for track_id in track_ids]
+    finally:
+        client.close()
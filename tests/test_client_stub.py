@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+import asyncio
+
+import pytest
+import zeep.exceptions
+
+from facho.fe import pipeline
+from facho.fe.client import dian
+from facho.fe.client.dian_async import AsyncDianClient
+from facho.fe.client.stub import DianStub
+
+from test_batch import SpecBuilder, specs
+
+
+@pytest.fixture
+def wsdl_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(dian, 'WSDL_CACHE_PATH', str(tmpdir.join('wsdl.sqlite')))
+
+
+@pytest.fixture
+def stub(wsdl_cache):
+    with DianStub(certfile='./tests/example.pem', polls_in_process=1) as stub:
+        yield stub
+
+
+def signature_client(stub):
+    return dian.DianSignatureClient('./tests/example.key', './tests/example.pem', wsdl=stub.wsdl)
+
+
+def test_stub_services(stub):
+    client = signature_client(stub)
+
+    status = client.request(dian.GetStatus('abc'))
+    assert status == dian.GetStatusResponse(True, 'Procesado Correctamente.', '00', None)
+
+    numbering = client.request(dian.GetNumberingRange('860046645', '800037646', 'software'))
+    assert numbering.NumberRangeResponse[0]['Prefix'] == 'SETP'
+
+    assert client.request(dian.SendBillSync('bill.zip', b'PK'))['IsValid']
+    assert client.request(dian.SendNominaSync(b'PK'))['StatusCode'] == '00'
+
+    zip_key = client.request(dian.SendBillAsync('bill.zip', b'PK'))['ZipKey']
+    test_set = client.request(dian.SendTestSetAsync('bill.zip', b'PK', 'set'))
+    assert test_set.ZipKey != zip_key
+
+    first = client.request(dian.GetStatusZip(zip_key))
+    assert (first.IsValid, first.StatusCode) == (False, '98')
+    second = client.request(dian.GetStatusZip(zip_key))
+    assert (second.IsValid, second.StatusCode) == (True, '00')
+
+    assert stub.requests == 8
+    assert stub.faults == 0
+
+
+def test_stub_rejects_unsigned(stub):
+    client = dian.DianClient('user', 'pass', wsdl=stub.wsdl)
+    with pytest.raises(zeep.exceptions.Fault):
+        client.request(dian.GetStatus('abc'))
+    assert stub.faults == 1
+
+
+def test_stub_errors_and_latency(wsdl_cache):
+    with DianStub(error_rate=1.0, latency={'GetStatus': 0.05}) as stub:
+        client = dian.DianClient('user', 'pass', wsdl=stub.wsdl)
+        with pytest.raises(zeep.exceptions.Fault, match='injected error'):
+            client.request(dian.GetStatus('abc'))
+
+    assert stub._latency('GetStatus') == 0.05
+    assert stub._latency('GetStatusZip') == 0.0
+
+
+def test_stub_async_gather_status(stub):
+    async def run():
+        async with AsyncDianClient(signature_client(stub), concurrency=4) as client:
+            return await client.gather_status(['track%d' % (i) for i in range(8)])
+
+    responses = asyncio.run(run())
+    assert all(response.IsValid for response in responses)
+    assert stub.requests == 8
+
+
+def test_stub_pipeline(stub):
+    journal = pipeline.Journal(':memory:')
+    generator = pipeline.SubmissionPipeline(SpecBuilder(), None, signature_client(stub), journal,
+                                            processes=1, poll_interval=0, max_files=2)
+    report = generator.run(specs(3))
+
+    assert report.batches == 2
+    assert journal.batch_states() == {'accepted': 2}
+    assert journal.document_states() == {'accepted': 3}
@@ -5,6 +5,8 @@
 
 """Tests for `facho` package."""
 
+import os
+
 import pytest
 from facho.fe.data.dian import codelist
 
@@ -22,3 +24,72 @@ def test_tipodocumento():
 
 def test_departamento():
     assert codelist.Departamento['05']['name'] == 'Antioquia'
+
+@pytest.fixture
+def cache_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(codelist, 'CACHE_DIR', str(tmpdir.join('cache')))
+    return tmpdir.join('cache')
+
+def test_codelist_lazy(cache_dir):
+    paises = codelist.CodeList(codelist.path_for_codelist('Paises-2.1.gc'), 'code', 'name')
+    assert paises._data is None
+    assert not cache_dir.check()
+
+    assert paises['CO']['name'] == 'Colombia'
+    assert len(cache_dir.listdir()) == 1
+
+def test_codelist_update_lazy(cache_dir):
+    tiporesponsabilidad = codelist.CodeList(codelist.path_for_codelist('TipoResponsabilidad-2.1.gc'), 'code', 'name')\
+        .update(codelist.CodeList(codelist.path_for_codelist('TipoResponsabilidad-2.1.custom.gc'), 'code', 'name'))
+    assert tiporesponsabilidad._data is None
+    assert tiporesponsabilidad.by_name('Autorretenedor')['code'] == codelist.TipoResponsabilidad.by_name('Autorretenedor')['code']
+    assert set(tiporesponsabilidad.rows) == set(codelist.TipoResponsabilidad.rows)
+
+def test_codelist_cache_used(cache_dir, monkeypatch):
+    filename = codelist.path_for_codelist('Paises-2.1.gc')
+    expected = codelist.CodeList(filename, 'code', 'name').rows
+
+    def fail(*args):
+        raise AssertionError('genericode parsed again')
+    monkeypatch.setattr(codelist, '_read_genericode', fail)
+    assert codelist.CodeList(filename, 'code', 'name').rows == expected
+
+def test_codelist_cache_invalidated_on_mtime(cache_dir, tmpdir):
+    filename = tmpdir.join('Paises.gc')
+    filename.write(open(codelist.path_for_codelist('Paises-2.1.gc'), 'rb').read(), mode='wb')
+    assert codelist.CodeList(str(filename), 'code', 'name')['CO']['name'] == 'Colombia'
+
+    filename.write(filename.read().replace('>Colombia<', '>Colombia!<'))
+    filename.setmtime(filename.mtime() + 10)
+    assert codelist.CodeList(str(filename), 'code', 'name')['CO']['name'] == 'Colombia!'
+
+def test_codelist_import_lazy(tmpdir):
+    import subprocess
+    import sys
+    code = (
+        "from facho.fe.data.dian import codelist\n"
+        "print(*sorted(k for k, v in vars(codelist).items()\n"
+        "              if isinstance(v, codelist.CodeList) and v._data is not None))\n"
+    )
+    env = dict(os.environ, FACHO_CACHE_DIR=str(tmpdir))
+    loaded = subprocess.check_output([sys.executable, '-c', code], env=env, text=True).split()
+    # los valores por omision de facho.fe.form consultan algunas listas
+    assert 'UnidadesMedida' not in loaded
+    assert 'TipoResponsabilidad' not in loaded
+
+def test_codelist_by_column():
+    assert codelist.Municipio.by_column('name', 'Medellín')['code'] == '05001'
+    assert codelist.Municipio.by_column('name', 'MEDELLIN', insensitive=True)['code'] == '05001'
+    assert codelist.TipoAmbiente.by_name('produccion', insensitive=True)['code'] == '1'
+    with pytest.raises(KeyError):
+        codelist.Municipio.by_column('name', 'MEDELLIN')
+
+def test_codelist_index_after_update(cache_dir, tmpdir):
+    base = codelist.CodeList(codelist.path_for_codelist('TipoResponsabilidad-2.1.gc'), 'code', 'name')
+    custom = codelist.CodeList(codelist.path_for_codelist('TipoResponsabilidad-2.1.custom.gc'), 'code', 'name')
+    name = next(v['name'] for k, v in custom.rows.items() if k not in base.rows)
+
+    with pytest.raises(KeyError):
+        base.by_name(name)
+    base.update(custom)
+    assert base.by_name(name) is custom.by_name(name)
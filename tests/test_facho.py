@@ -118,6 +118,19 @@ def test_facho_xml_fragments():
 
     assert xml.tostring() == '<Invoice><Line><Id>1</Id></Line><Line><Id>2</Id></Line><Line><Id>3</Id></Line></Invoice>'
 
+def test_facho_xml_fragment_is_view():
+    xml = facho.FachoXML('Invoice')
+    xml.set_element_validator('./Id', lambda text, attrs: text == 'mero')
+
+    line = xml.fragment('/Invoice/Line')
+    assert line.builder is xml.builder
+    assert not hasattr(line, '__dict__')
+
+    with pytest.raises(facho.FachoValueInvalid):
+        line.set_element('./Id', 'bad')
+    line.set_element('./Id', 'mero')
+    assert xml.tostring() == '<Invoice><Line><Id>mero</Id></Line></Invoice>'
+
 def test_facho_xml_nested_fragments():
     xml = facho.FachoXML('Invoice')
     party = xml.fragment('/Invoice/Party')
@@ -233,6 +246,34 @@ def test_facho_xml_keep_orden_slibing():
 
     assert xml.tostring() == '<root><A/><A/><B/><B/><C/></root>'
 
+def test_facho_xml_keep_orden_slibing_repeated_appends():
+    xml = facho.FachoXML('root')
+    xml.find_or_create_element('./A')
+    xml.find_or_create_element('./B')
+    for _ in range(3):
+        xml.find_or_create_element('./A', append=True)
+        xml.find_or_create_element('./B', append=True)
+    xml.find_or_create_element('./C')
+    xml.find_or_create_element('./A', append=True)
+
+    assert xml.tostring() == '<root><A/><A/><A/><A/><A/><B/><B/><B/><B/><C/></root>'
+
+def test_facho_xml_append_after_remove_slibing():
+    xml = facho.FachoXML('root')
+    xml.find_or_create_element('./A')
+    xml.find_or_create_element('./B')
+    last = xml.find_or_create_element('./A', append=True)
+    last.text = 'last'
+
+    xml.remove_element(last)
+    xml.find_or_create_element('./A', append=True)
+    assert xml.tostring() == '<root><A/><A/><B/></root>'
+
+    # eliminado sin FachoXML
+    xml.root.remove(xml.root[1])
+    xml.find_or_create_element('./A', append=True).text = 'new'
+    assert xml.tostring() == '<root><A/><A>new</A><B/></root>'
+
 def test_facho_xml_placeholder_optional():
     xml = facho.FachoXML('root')
     xml.placeholder_for('./A')
@@ -392,6 +433,43 @@ def test_facho_xml_query_element_text_or_attribute_from_fragment():
 
     assert invoice.get_element_text_or_attribute('/Invoice/A') == 'contenido'
 
+def test_facho_xml_extract_single_pass():
+    xml = facho.FachoXML('root')
+    xml.set_element('./A', 'a', clave='valor')
+    xml.set_element('./B/C', 'c1')
+    xml.set_element('./B/C', 'c2', append_=True)
+    xml.set_element('./B/D', 'd')
+
+    xpaths = ['/root/A', '/root/A/@clave', '/root/B/C', './B/D',
+              '/root/B/C[2]', '/root/A/@missing', '/root/E']
+    assert xml.extract(xpaths) == {
+        '/root/A': 'a',
+        '/root/A/@clave': 'valor',
+        '/root/B/C': 'c1',
+        './B/D': 'd',
+        '/root/B/C[2]': 'c2',
+        '/root/A/@missing': None,
+        '/root/E': None,
+    }
+    assert xml.get_elements_text_or_attributes(['/root/A', ('fijo',), '/root/B/D']) == ['a', 'fijo', 'd']
+
+    with pytest.raises(ValueError):
+        xml.extract(['/root/E'], raise_on_fail=True)
+    with pytest.raises(KeyError):
+        xml.extract(['/root/A/@missing'], raise_on_fail=True)
+
+def test_facho_xml_find_elements_same_as_get_element():
+    xml = facho.FachoXML('{%s}root' % ('http://www.dian.gov.co/contratos/facturaelectronica/v1'),
+                         nsmap={'fe': 'http://www.dian.gov.co/contratos/facturaelectronica/v1'})
+    xml.set_element('./fe:A/fe:B', 'b')
+    xml.set_element('./C', 'c')
+    invoice = xml.fragment('./fe:A')
+
+    xpaths = ['/fe:root/fe:A/fe:B', '/fe:root/C', '/fe:root/fe:C', '//fe:B', '/fe:root/fe:A/fe:B/text()']
+    assert xml.find_elements(xpaths) == [xml.get_element(xpath) for xpath in xpaths]
+    assert invoice.find_elements(['/fe:A/fe:B']) == [invoice.get_element('/fe:A/fe:B')]
+    assert invoice.extract(['./fe:B']) == {'./fe:B': invoice.get_element_text('./fe:B')}
+
 def test_facho_xml_build_xml_absolute():
     xml = facho.FachoXML('root')
 
@@ -415,3 +493,136 @@ def test_facho_xml_build_xml_absolute_namespace_from_fragment():
     xpath = invoice.xpath_from_root('/A')
     assert xpath == '/fe:root/Invoice/A'
 
+
+def test_facho_xml_xpath_plan_shared_between_documents():
+    a = facho.FachoXML('root')
+    b = facho.FachoXML('root')
+
+    plan = a.builder.compile_xpath('./A/B[id=1]')
+    assert plan is b.builder.compile_xpath('./A/B[id=1]')
+    assert plan.root is None
+    assert [step.tag for step in plan.steps] == ['A', 'B']
+    assert plan.steps[-1].attrs == {'id': '1'}
+
+    a.find_or_create_element('./A/B[id=1]')
+    b.find_or_create_element('./A/B[id=1]')
+    assert a.tostring() == b.tostring() == '<root><A><B id="1"/></A></root>'
+
+def test_facho_xml_xpath_plan_by_nsmap():
+    a = facho.FachoXML('root', nsmap={'ext': 'https://ext'})
+    b = facho.FachoXML('root', nsmap={'ext': 'https://other'})
+
+    plan_a = a.builder.compile_xpath('/root/ext:A')
+    plan_b = b.builder.compile_xpath('/root/ext:A')
+    assert plan_a.steps[0].tag == '{https://ext}A'
+    assert plan_b.steps[0].tag == '{https://other}A'
+
+def test_facho_xml_xpath_plan_absolute_root_mismatch():
+    xml = facho.FachoXML('root')
+
+    with pytest.raises(ValueError):
+        xml.find_or_create_element('/other/A')
+
+def test_facho_xml_prefix_index_reuses_ancestors():
+    xml = facho.FachoXML('root')
+    xml.set_element('./A/B/C/D', '1')
+    xml.set_element('./A/B/C/E', '2')
+    xml.set_element('/root/A/B/F', '3')
+
+    assert xml.tostring() == '<root><A><B><C><D>1</D><E>2</E></C><F>3</F></B></A></root>'
+    assert xml._prefix_index[(xml.root, 'A/B/C')] is xml.get_element('/root/A/B/C')
+
+def test_facho_xml_prefix_index_shared_with_fragment():
+    xml = facho.FachoXML('root')
+    fragment = xml.fragment('./A/B')
+    fragment.set_element('./C', '1')
+
+    assert xml._prefix_index is fragment._prefix_index
+    assert xml.tostring() == '<root><A><B><C>1</C></B></A></root>'
+
+def test_facho_xml_prefix_index_invalidated_on_replacement():
+    xml = facho.FachoXML('root')
+    xml.set_element('./child/type/value', '1')
+    xml.replacement_for('./child/type',
+                        './child/code', 'test')
+    xml.set_element('./child/type/value', '2')
+
+    assert xml.tostring() == '<root><child><code>test</code><type><value>2</value></type></child></root>'
+
+def test_facho_xml_prefix_index_detached_with_lxml():
+    xml = facho.FachoXML('root')
+    xml.set_element('./A/B/C', 'one')
+    b = xml.get_element('/root/A/B')
+    b.getparent().remove(b)
+    xml.set_element('./A/B/D', 'two')
+
+    assert xml.tostring() == '<root><A><B><D>two</D></B></A></root>'
+
+    d = xml.get_element('/root/A/B/D')
+    d.getparent().remove(d)
+    xml.set_element('./A/B/D', 'three')
+
+    assert xml.tostring() == '<root><A><B><D>three</D></B></A></root>'
+
+def test_facho_xml_tostring_keeps_live_tree():
+    xml = facho.FachoXML('root')
+    xml.placeholder_for('./A')
+    xml.placeholder_for('./B', optional=True)
+    xml.placeholder_for('./C', optional=True)
+    xml.set_attributes('./C', code='1')
+
+    assert xml.tostring() == '<root><A/><C code="1"/></root>'
+    assert [child.tag for child in xml.root] == ['A', 'B', 'C']
+    assert xml.exist_element('/root/A') == False
+    assert xml.exist_element('/root/B') == False
+    assert xml.tostring() == '<root><A/><C code="1"/></root>'
+
+def test_facho_xml_placeholder_without_marker_attributes():
+    xml = facho.FachoXML('root')
+    xml.placeholder_for('./A')
+    xml.placeholder_for('./B', optional=True)
+
+    for elem in xml.root.iter():
+        assert elem.keys() == []
+
+def test_facho_xml_clone_keeps_placeholders():
+    skeleton = facho.FachoXML('root')
+    skeleton.placeholder_for('./A')
+    skeleton.placeholder_for('./B', optional=True)
+    skeleton.set_element('./C/D', 'd')
+
+    xml = skeleton.clone()
+    assert xml.root is not skeleton.root
+    xml.set_element('./B', 'b')
+    xml.set_element('./C/E', 'e')
+    # el placeholder copiado se puebla en lugar de adicionar
+    xml.find_or_create_element('./A', append=True)
+    xml.find_or_create_element('./A', append=True)
+
+    assert xml.tostring() == '<root><A/><A/><B>b</B><C><D>d</D><E>e</E></C></root>'
+    assert skeleton.tostring() == '<root><A/><C><D>d</D></C></root>'
+
+def test_facho_xml_xpath_cache_counters():
+    xml = facho.FachoXML('root')
+    xml.set_element('./cache/A', 'a')
+
+    before = facho.xpath_cache_info()
+    assert xml.get_element_text('/root/cache/A') == 'a'
+    assert xml.get_element_text('/root/cache/A') == 'a'
+    assert xml.exist_element('/root/cache/A')
+    after = facho.xpath_cache_info()
+
+    assert after.compiled.misses - before.compiled.misses == 1
+    assert after.compiled.hits - before.compiled.hits == 2
+
+def test_facho_xml_xpath_plan_cache_counters():
+    builder = facho.LXMLBuilder({'ext': 'http://facho.test/plan-cache'})
+
+    before = facho.xpath_cache_info()
+    plan = builder.compile_xpath('./plan/ext:cache')
+    assert plan is builder.compile_xpath('./plan/ext:cache')
+    after = facho.xpath_cache_info()
+
+    assert after.plans.misses - before.plans.misses == 1
+    assert after.plans.hits - before.plans.hits == 1
+    assert after.plans.maxsize == facho.XPATH_CACHE_SIZE
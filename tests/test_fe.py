@@ -116,3 +116,186 @@ def test_xml_sign_dian_using_bytes(monkeypatch):
 
     xmlsigned = signer.sign_xml_string(xmlstring)
     assert "Signature" in xmlsigned
+
+
+def _xml_to_sign():
+    xml = fe.FeXML('Invoice',
+                'http://www.dian.gov.co/contratos/facturaelectronica/v1')
+    xml.find_or_create_element('/fe:Invoice/ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent')
+    ublextension = xml.fragment('/fe:Invoice/ext:UBLExtensions/ext:UBLExtension', append=True)
+    ublextension.find_or_create_element('/ext:UBLExtension/ext:ExtensionContent')
+    return xml.tostring()
+
+
+def test_xml_sign_dian_load_pkcs12_once(monkeypatch):
+    calls = []
+    load_pkcs12 = fe.fe.OpenSSL.crypto.load_pkcs12
+    def counter(*args):
+        calls.append(args)
+        return load_pkcs12(*args)
+    monkeypatch.setattr(fe.fe.OpenSSL.crypto, 'load_pkcs12', counter)
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    for _ in range(3):
+        assert "Signature" in signer.sign_xml_string(_xml_to_sign())
+    assert len(calls) == 1
+
+
+def test_xml_sign_dian_policy_digest():
+    import base64
+    import hashlib
+
+    policy = open('./facho/fe/data/dian/politicadefirmav2.pdf', 'rb').read()
+    digest = base64.b64encode(hashlib.sha256(policy).digest()).decode()
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    xmlsigned = signer.sign_xml_string(_xml_to_sign())
+    assert '<ds:DigestValue>%s</ds:DigestValue>' % (digest) in xmlsigned
+
+
+def test_xml_sign_dian_shared_between_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        signed = list(executor.map(lambda _: signer.sign_xml_string(_xml_to_sign()), range(8)))
+
+    assert all("Signature" in xmlsigned for xmlsigned in signed)
+
+
+def test_xml_sign_dian_pickle_without_cache():
+    import pickle
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    signer.sign_xml_string(_xml_to_sign())
+
+    copy = pickle.loads(pickle.dumps(signer))
+    assert copy._key is None
+    assert "Signature" in copy.sign_xml_string(_xml_to_sign())
+
+
+@pytest.mark.parametrize('verify_after_sign, verified', [
+    (True, 6),
+    (False, 0),
+    (3, 2),
+])
+def test_xml_sign_dian_verify_after_sign(monkeypatch, verify_after_sign, verified):
+    calls = []
+    verify = fe.fe.xades.XAdESContext.verify
+    def counter(self, node):
+        calls.append(node)
+        return verify(self, node)
+    monkeypatch.setattr(fe.fe.xades.XAdESContext, 'verify', counter)
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12', verify_after_sign=verify_after_sign)
+    for _ in range(6):
+        signer.sign_xml_string(_xml_to_sign())
+    assert len(calls) == verified
+
+
+def test_xml_sign_dian_verify_after_sign_invalid():
+    with pytest.raises(ValueError):
+        fe.DianXMLExtensionSigner('./tests/example.p12', verify_after_sign=0)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_xml_signer_verifier_path(tmpdir, processes):
+    import zipfile
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12', verify_after_sign=False)
+    documents = {
+        'a.xml': signer.sign_xml_string(_xml_to_sign()),
+        'b.xml': signer.sign_xml_string(_xml_to_sign()).replace('<Invoice ', '<Invoice a="1" '),
+        'c.xml': signer.sign_xml_string(_xml_to_sign()),
+    }
+    directory = tmpdir.mkdir('signed')
+    for name, document in documents.items():
+        directory.join(name).write(document)
+    directory.join('README').write('no xml')
+    zippath = str(tmpdir.join('signed.zip'))
+    with zipfile.ZipFile(zippath, 'w') as zipf:
+        for name, document in documents.items():
+            zipf.writestr(name, document)
+
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12')
+    expected = [('a.xml', True), ('b.xml', False), ('c.xml', True)]
+    assert verifier.verify_path(str(directory), processes=processes) == expected
+    assert verifier.verify_path(zippath, processes=processes) == expected
+
+
+def test_xml_signer_verifier_worker_loads_key_once(monkeypatch):
+    import pickle
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12', verify_after_sign=False)
+    document = signer.sign_xml_string(_xml_to_sign()).encode('utf-8')
+
+    calls = []
+    load_pkcs12 = fe.fe.load_pkcs12
+    def counted_load_pkcs12(*args):
+        calls.append(args)
+        return load_pkcs12(*args)
+    monkeypatch.setattr(fe.fe, 'load_pkcs12', counted_load_pkcs12)
+
+    # como lo recibe cada proceso del grupo
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12')
+    fe.fe._init_verifier(pickle.loads(pickle.dumps(verifier)))
+    for index in range(20):
+        assert fe.fe._run_verifier(('%d.xml' % (index), document)) == ('%d.xml' % (index), True)
+    assert len(calls) == 1
+
+
+def test_xml_sign_dian_local_policy_without_patch(monkeypatch):
+    def urlopen(*args):
+        raise AssertionError('policy must not be downloaded')
+    monkeypatch.setattr(fe.fe.xades.policy.urllib, 'urlopen', urlopen)
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    other = fe.DianXMLExtensionSigner('./tests/example.p12')
+    assert "Signature" in signer.sign_xml_string(_xml_to_sign())
+    assert "Signature" in other.sign_xml_string(_xml_to_sign())
+    assert signer._policy is other._policy
+    assert signer._policy is fe.fe.DianSignaturePolicy.local()
+
+
+def test_xml_signer_verifier_offline(monkeypatch):
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12', verify_after_sign=False)
+    xmlsigned = signer.sign_xml_string(_xml_to_sign()).encode('utf-8')
+
+    def urlopen(*args):
+        raise OSError('offline')
+    monkeypatch.setattr(fe.fe.xades.policy.urllib, 'urlopen', urlopen)
+
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12', localpolicy=False)
+    assert verifier.verify_string(xmlsigned)
+
+    # una politica que falla no escapa de verify_string
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12',
+                                                    policy=fe.fe.DianSignaturePolicy())
+    assert not verifier.verify_string(xmlsigned)
+
+def test_xml_sign_dian_custom_policy():
+    import base64
+    import hashlib
+
+    policy = fe.fe.DianSignaturePolicy(b'politica facho')
+    digest = base64.b64encode(hashlib.sha256(b'politica facho').digest()).decode()
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12', policy=policy)
+    xmlsigned = signer.sign_xml_string(_xml_to_sign())
+    assert '<ds:DigestValue>%s</ds:DigestValue>' % (digest) in xmlsigned
+
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12', policy=policy)
+    assert verifier.verify_string(xmlsigned.encode('utf-8'))
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12')
+    assert not verifier.verify_string(xmlsigned.encode('utf-8'))
+
+
+def test_fexml_tostring_root_modified():
+    xml = fe.FeXML('Invoice',
+                   'http://www.dian.gov.co/contratos/facturaelectronica/v1')
+    xml.set_element('/fe:Invoice/cbc:ID', '1')
+    xml.root.set('schemaLocation', 'http://www.dian.gov.co/contratos/facturaelectronica/v1 invoice.xsd')
+
+    assert xml.tostring() == helpers.legacy_fexml_tostring(xml)
+    assert 'xsi:schemaLocation=' in xml.tostring()
+    assert xml.get_element_text('/fe:Invoice/cbc:ID') == '1'
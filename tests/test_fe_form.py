@@ -275,3 +275,54 @@ def test_debit_note_cude(simple_debit_note_without_lines):
     xml_invoice.add_extension(cude_extension)
     cude = xml_invoice.get_element_text('/fe:DebitNote/cbc:UUID')
     assert cude == '3fa73a86d57d9341c536afde1f85c4efd9d4591c2c22bce4dfb0e6b0d2e83b8f047a8bde7098292e9d2493e60d1c31da'
+
+
+def test_dianzip_stream_sources(tmpdir):
+    xmlpath = tmpdir.join('doc.xml')
+    xmlpath.write('<Invoice>path</Invoice>')
+
+    zipdata = io.BytesIO()
+    with fe.DianZIP(zipdata) as dianzip:
+        names = [
+            dianzip.add_xml('str', '<Invoice>ñ</Invoice>'),
+            dianzip.add_xml('bytes', b'<Invoice>bytes</Invoice>'),
+            dianzip.add_xml('iter', iter(['<Invoice>', b'iter', '</Invoice>'])),
+            dianzip.add_xml('fileobj', io.BytesIO(b'<Invoice>fileobj</Invoice>')),
+            dianzip.add_file('path', str(xmlpath)),
+        ]
+
+    with zipfile.ZipFile(zipdata) as dianzip:
+        assert [dianzip.read(name).decode('utf-8') for name in names] == [
+            '<Invoice>ñ</Invoice>',
+            '<Invoice>bytes</Invoice>',
+            '<Invoice>iter</Invoice>',
+            '<Invoice>fileobj</Invoice>',
+            '<Invoice>path</Invoice>',
+        ]
+
+
+def test_dianzip_max_files():
+    with fe.DianZIP(io.BytesIO(), max_files=2) as dianzip:
+        dianzip.add_xml('a', '<a/>')
+        dianzip.add_xml('b', '<b/>')
+        assert dianzip.is_full()
+        with pytest.raises(ValueError):
+            dianzip.add_xml('c', '<c/>')
+
+
+def test_dian_zips_rollover():
+    documents = (('doc%d' % (i), '<Invoice>%d</Invoice>' % (i)) for i in range(120))
+    archives = list(fe.dian_zips(documents))
+
+    assert [len(archive.filenames) for archive in archives] == [50, 50, 20]
+    name, filename = archives[2].filenames[-1]
+    assert name == 'doc119'
+    with zipfile.ZipFile(io.BytesIO(archives[2].content)) as dianzip:
+        assert len(dianzip.namelist()) == 20
+        assert dianzip.read(filename) == b'<Invoice>119</Invoice>'
+        for zipinfo in dianzip.infolist():
+            assert zipinfo.compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_dian_zips_empty():
+    assert list(fe.dian_zips([])) == []
@@ -94,3 +94,57 @@ def test_allowance_charge_in_invoice_line(simple_invoice_without_lines):
         assert xml.get_element_text('/fe:Invoice/cac:AllowanceCharge/cbc:ID') == '1'
     xml.get_element_text('/fe:Invoice/cac:InvoiceLine/cac:AllowanceCharge/cbc:ID') == '1'
     xml.get_element_text('/fe:Invoice/cac:InvoiceLine/cac:AllowanceCharge/cbc:BaseAmount') == '100.0'
+
+
+def test_invoice_sign_fachoxml(simple_invoice, fixed_signature):
+    from facho import fe
+
+    xml = form_xml.DIANInvoiceXML(simple_invoice)
+    xml.add_extension(fe.DianXMLExtensionCUFE(simple_invoice))
+    unsigned = xml.tostring()
+
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    signed = signer.sign_fachoxml(xml)
+    assert xml.tostring() == unsigned
+
+    fixed_signature()
+    expected = signer.sign_xml_string(xml.tostring(xml_declaration=True, encoding='UTF-8').encode('utf-8'))
+    assert signed == expected
+
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12')
+    assert verifier.verify_string(signed.encode('utf-8'))
+
+
+def test_invoice_dianwrite_signed(simple_invoice, tmpdir):
+    from facho import fe
+
+    xml = form_xml.DIANInvoiceXML(simple_invoice)
+    filename = str(tmpdir.join('invoice.xml'))
+    form_xml.DIANWriteSigned(xml, filename, './tests/example.p12', None, True)
+
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12')
+    assert verifier.verify_string(open(filename, 'rb').read())
+
+
+@pytest.mark.parametrize('document', ['invoice', 'credit_note', 'debit_note', 'attached_document'])
+def test_fexml_tostring_same_as_legacy(request, document):
+    import helpers
+    from facho import fe
+
+    if document == 'invoice':
+        inv = request.getfixturevalue('simple_invoice')
+        xml = form_xml.DIANInvoiceXML(inv)
+        xml.add_extension(fe.DianXMLExtensionCUFE(inv))
+    elif document == 'credit_note':
+        inv = request.getfixturevalue('simple_credit_note_without_lines')
+        xml = form_xml.DIANCreditNoteXML(inv)
+    elif document == 'debit_note':
+        inv = request.getfixturevalue('simple_debit_note_without_lines')
+        xml = form_xml.DIANDebitNoteXML(inv)
+    else:
+        xml = form_xml.AttachedDocument(id='123').toFachoXML()
+
+    assert xml.tostring() == helpers.legacy_fexml_tostring(xml)
+    assert xml.tostring(xml_declaration=True, encoding='UTF-8') ==\
+        helpers.legacy_fexml_tostring(xml, xml_declaration=True, encoding='UTF-8')
+    assert xml.tostring(pretty_print=True) == helpers.legacy_fexml_tostring(xml, pretty_print=True)
@@ -11,6 +11,7 @@ import pytest
 from facho import fe
 
 import helpers
+from fixtures import fixed_signature
 
 def assert_error(errors, msg):
     for error in errors:
@@ -468,3 +469,56 @@ def test_nomina_devengado_horas_recargo_nocturno_dominicales_y_festivos():
 def test_fecha_validacion():
     with pytest.raises(ValueError) as e:
         fe.nomina.Fecha('535-35-3')
+
+
+def test_nomina_signer_verify_after_sign():
+    signer = fe.nomina.DianXMLExtensionSigner('./tests/example.p12', verify_after_sign=10)
+    assert signer._verify_after_sign == 10
+
+
+def test_nomina_sign_fachoxml(fixed_signature):
+    nomina = fe.nomina.DIANNominaIndividual()
+    xml = nomina.toFachoXML()
+    unsigned = xml.tostring()
+
+    signer = fe.nomina.DianXMLExtensionSigner('./tests/example.p12')
+    signed = signer.sign_fachoxml(xml)
+    assert xml.tostring() == unsigned
+
+    fixed_signature()
+    expected = signer.sign_xml_string(xml.tostring(xml_declaration=True, encoding='UTF-8').encode('utf-8'))
+    assert signed == expected
+
+    verifier = fe.fe.DianXMLExtensionSignerVerifier('./tests/example.p12')
+    assert verifier.verify_string(signed.encode('utf-8'))
+
+
+@pytest.mark.parametrize('nomina', [
+    fe.nomina.DIANNominaIndividualDeAjuste.Reemplazar,
+    fe.nomina.DIANNominaIndividualDeAjuste.Eliminar,
+])
+def test_nomina_ajuste_tostring_same_as_legacy(nomina):
+    xml = nomina().toFachoXML()
+    assert xml.tostring() == helpers.legacy_fexml_tostring(xml)
+
+
+def test_nomina_tostring_same_as_legacy():
+    xml = fe.nomina.DIANNominaIndividual().toFachoXML()
+    legacy = helpers.legacy_fexml_tostring(xml)
+
+    # la reescritura anterior convertia xmlns:nominaajuste en el atributo xmlnsajuste
+    assert 'xmlnsajuste=' in legacy
+    assert xml.tostring() == legacy.replace('xmlnsajuste=', 'xmlns:nominaajuste=')
+
+
+def test_nomina_skeleton_not_shared():
+    nomina = fe.nomina.DIANNominaIndividual()
+    nomina.adicionar_devengado(fe.nomina.DevengadoBasico(
+        dias_trabajados=30,
+        sueldo_trabajado=fe.nomina.Amount(1_000_000)
+    ))
+    other = fe.nomina.DIANNominaIndividual()
+
+    assert nomina.fexml.root is not other.fexml.root
+    assert other.fexml.root.find('./Devengados/Basico').get('DiasTrabajados') is None
+    assert nomina.fexml.root.find('./Devengados/Basico').get('DiasTrabajados') == '30'
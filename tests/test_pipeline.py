@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+import io
+import threading
+import zipfile
+
+from facho import fe
+from facho.fe import pipeline
+from facho.fe.client import dian
+
+from test_batch import SpecBuilder, specs
+
+
+class StubDianGateway(dian.DianGateway):
+    """
+    DIAN en memoria: recibe ZIP y responde en proceso las
+    primeras `in_process` consultas de cada uno.
+    """
+
+    def __init__(self, in_process=1, fail_submit=()):
+        self.in_process = in_process
+        self.fail_submit = set(fail_submit)
+        self.zips = {}
+        self.polls = {}
+        self.services = []
+        self.lock = threading.Lock()
+
+    def request(self, service):
+        with self.lock:
+            self.services.append(service.service())
+            if service.service() in ('SendBillAsync', 'SendTestSetAsync'):
+                if len(self.zips) in self.fail_submit:
+                    self.fail_submit.discard(len(self.zips))
+                    raise ValueError('zip rechazado')
+                zip_key = 'zip%d' % (len(self.zips))
+                with zipfile.ZipFile(io.BytesIO(service.contentFile)) as zipf:
+                    self.zips[zip_key] = [zipf.read(name) for name in zipf.namelist()]
+                return service.build_response({'ZipKey': zip_key, 'ErrorMessageList': None})
+
+            polls = self.polls.get(service.trackId, 0)
+            self.polls[service.trackId] = polls + 1
+            code = '98' if polls < self.in_process else '00'
+            return dian.GetStatusResponse(code == '00', 'estado %s' % (code), code, None)
+
+
+def run_pipeline(journal, gateway, items, **kw):
+    kw.setdefault('processes', 1)
+    kw.setdefault('poll_interval', 0)
+    generator = pipeline.SubmissionPipeline(SpecBuilder(), None, gateway, journal, **kw)
+    return generator.run(items)
+
+
+def test_pipeline_submit_and_poll():
+    journal = pipeline.Journal(':memory:')
+    gateway = StubDianGateway()
+
+    report = run_pipeline(journal, gateway, specs(7), max_files=3)
+
+    assert report.documents == 7
+    assert report.batches == 3
+    assert report.errors == []
+    assert sorted(len(documents) for documents in gateway.zips.values()) == [1, 3, 3]
+    assert journal.batch_states() == {'accepted': 3}
+    assert journal.document_states() == {'accepted': 7}
+    # cada ZIP se consulta hasta salir de proceso
+    assert gateway.services.count('GetStatusZip') == 6
+
+
+def test_pipeline_resume(tmpdir):
+    path = str(tmpdir.join('journal.sqlite'))
+    gateway = StubDianGateway(in_process=10, fail_submit=[1])
+
+    journal = pipeline.Journal(path)
+    report = run_pipeline(journal, gateway, specs(4), max_files=2, max_polls=1)
+    assert report.documents == 4
+    assert journal.batch_states() == {'submitted': 1, 'failed': 1}
+    journal.close()
+
+    # se omiten los documentos enviados, se reenvia el ZIP fallido
+    # y se retoma la consulta del pendiente
+    gateway.in_process = 0
+    journal = pipeline.Journal(path)
+    report = run_pipeline(journal, gateway, specs(4), max_files=2)
+    assert report.documents == 2
+    assert report.skipped == 2
+    assert journal.batch_states() == {'accepted': 2, 'failed': 1}
+    assert journal.document_states() == {'accepted': 4}
+    assert journal.submitted_batches() == []
+
+
+def test_pipeline_resume_does_not_delay_new_documents():
+    journal = pipeline.Journal(':memory:')
+    # ZIP pendientes de una ejecucion anterior, mas de lo que cabe en la cola
+    for index in range(20):
+        batch_id = journal.batch_created([('OLD%d' % (index), 'old%d.xml' % (index))])
+        journal.batch_submitted(batch_id, 'old%d.zip' % (index), 'old%d' % (index))
+    gateway = StubDianGateway(in_process=10)
+
+    report = run_pipeline(journal, gateway, specs(2), concurrency=1,
+                          poll_interval=0.01, max_polls=2)
+
+    assert report.batches == 1
+    # el nuevo ZIP se envia antes de terminar las consultas retomadas
+    assert gateway.services.index('SendBillAsync') < 10
+    assert gateway.services.count('GetStatusZip') == 21 * 2
+
+
+def test_pipeline_errors_and_test_set():
+    journal = pipeline.Journal(':memory:')
+    gateway = StubDianGateway(in_process=0)
+    items = specs(3)
+    items[1]['operation_type'] = 'invalid'
+
+    report = run_pipeline(journal, gateway, items, test_set_id='set', habilitacion=True)
+
+    assert [index for index, error in report.errors] == [1]
+    assert report.documents == 2
+    assert gateway.services == ['SendTestSetAsync', 'GetStatusZip']
+    assert journal.document_states() == {'accepted': 2}
+
+
+def test_pipeline_signed_processes(tmpdir):
+    journal = pipeline.Journal(':memory:')
+    gateway = StubDianGateway(in_process=0)
+    signer = fe.DianXMLExtensionSigner('./tests/example.p12')
+    generator = pipeline.SubmissionPipeline(SpecBuilder(), signer, gateway, journal,
+                                            output_dir=str(tmpdir), processes=2,
+                                            poll_interval=0)
+    report = generator.run(specs(3))
+
+    assert report.documents == 3
+    [documents] = gateway.zips.values()
+    assert all(b'<ds:SignatureValue' in document for document in documents)
+    assert sorted(tmpdir.listdir(lambda p: p.ext == '.xml')) == [
+        tmpdir.join('SETP%d.xml' % (i)) for i in range(3)]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+import json
+import zipfile
+
+import pytest
+from click.testing import CliRunner
+
+from facho import cli
+from facho.fe import form_xml
+from facho.fe import validation
+
+from fixtures import *
+
+
+VALID_INVOICE = b'''<Invoice xmlns="http://www.dian.gov.co/contratos/facturaelectronica/v1" xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2" xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2">
+<cbc:ID>SETP1</cbc:ID>
+<cbc:IssueDate>2021-05-03</cbc:IssueDate>
+<cac:AccountingSupplierParty><cac:Party/></cac:AccountingSupplierParty>
+<cac:AccountingCustomerParty><cac:Party/></cac:AccountingCustomerParty>
+<cac:LegalMonetaryTotal><cbc:PayableAmount currencyID="COP">100.00</cbc:PayableAmount></cac:LegalMonetaryTotal>
+<cac:InvoiceLine><cbc:ID>1</cbc:ID><cbc:LineExtensionAmount currencyID="COP">100.00</cbc:LineExtensionAmount><cac:Item/></cac:InvoiceLine>
+</Invoice>'''
+
+
+@pytest.fixture
+def documents(tmpdir, simple_invoice):
+    simple_invoice.calculate()
+    tmpdir.join('a_valid.xml').write(VALID_INVOICE, mode='wb')
+    tmpdir.join('b_invoice.xml').write(form_xml.DIANInvoiceXML(simple_invoice).tostring())
+    tmpdir.join('c_broken.xml').write('<Invoice')
+    tmpdir.join('d_unknown.xml').write('<Factura/>')
+    tmpdir.join('notes.txt').write('ignored')
+    return tmpdir
+
+
+def test_validate_document_namespace():
+    result = validation.validate_document(VALID_INVOICE, 'a.xml', detailed=False)
+    assert result == validation.ValidationResult('a.xml', 'Invoice', True, [])
+
+
+def test_validate_document_invalid_lxml(simple_invoice):
+    simple_invoice.calculate()
+    content = form_xml.DIANInvoiceXML(simple_invoice).tostring().encode()
+    result = validation.validate_document(content, detailed=False)
+    assert result.document_type == 'Invoice'
+    assert not result.valid
+    assert result.errors[0].startswith('line ')
+
+
+def test_validate_document_engine():
+    with pytest.raises(ValueError):
+        validation.validate_document(VALID_INVOICE, engine='saxon')
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_validate_path(documents, processes):
+    results = validation.validate_path(str(documents), processes=processes, detailed=False)
+
+    assert [(r.name, r.document_type, r.valid) for r in results] == [
+        ('a_valid.xml', 'Invoice', True),
+        ('b_invoice.xml', 'Invoice', False),
+        ('c_broken.xml', None, False),
+        ('d_unknown.xml', None, False),
+    ]
+    assert results[3].errors == ['unknown document type Factura']
+
+
+def test_validate_path_zip(documents, tmpdir):
+    zippath = str(tmpdir.join('documents.zip'))
+    with zipfile.ZipFile(zippath, 'w') as zipf:
+        zipf.writestr('a_valid.xml', VALID_INVOICE)
+        zipf.writestr('c_broken.xml', '<Invoice')
+
+    results = validation.validate_path(zippath, processes=1)
+    assert [(r.name, r.valid) for r in results] == [('a_valid.xml', True), ('c_broken.xml', False)]
+
+
+def test_validate_batch_command(documents):
+    runner = CliRunner()
+    result = runner.invoke(cli.main, ['validate-batch', '--processes', '1', '--no-detailed', str(documents)])
+
+    assert result.exit_code == 1
+    report = json.loads(result.output)
+    assert report['documents'] == 4
+    assert report['valid'] == 1
+    assert report['invalid'] == 3
+    assert report['results'][0] == {
+        'name': 'a_valid.xml', 'document_type': 'Invoice', 'valid': True, 'errors': []
+    }
+
+
+def test_validate_document_detailed(simple_invoice):
+    simple_invoice.calculate()
+    content = form_xml.DIANInvoiceXML(simple_invoice).tostring().encode()
+    result = validation.validate_document(content)
+    assert not result.valid
+    assert any(error.startswith('/Invoice') for error in result.errors)
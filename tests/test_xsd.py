@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This file is part of facho.  The COPYRIGHT file at the top level of
+# this repository contains the full copyright notices and license terms.
+
+import os
+import subprocess
+import sys
+
+import pytest
+import xmlschema
+
+from facho.fe.data.dian import XSD
+
+
+XSD_TEMPLATE = '''<?xml version="1.0"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:include schemaLocation="types.xsd"/>
+  <xs:element name="Documento" type="DocumentoType"/>
+</xs:schema>
+'''
+
+TYPES_TEMPLATE = '''<?xml version="1.0"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:simpleType name="DocumentoType">
+    <xs:restriction base="xs:string">
+      <xs:maxLength value="%d"/>
+    </xs:restriction>
+  </xs:simpleType>
+</xs:schema>
+'''
+
+
+@pytest.fixture
+def xsd_path(tmpdir, monkeypatch):
+    monkeypatch.setattr(XSD, 'CACHE_DIR', str(tmpdir.join('cache')))
+    tmpdir.join('types.xsd').write(TYPES_TEMPLATE % (3))
+    path = tmpdir.join('documento.xsd')
+    path.write(XSD_TEMPLATE)
+    return str(path)
+
+
+def test_xsd_schemas_exist():
+    for dirname, xsdname in XSD.SCHEMAS.values():
+        if dirname == 'nomina':
+            continue
+        assert os.path.exists(XSD.path_for_xsd(dirname, xsdname))
+    for name in ['UBLInvoice', 'UBLCreditNote', 'UBLDebitNote', 'UBLAttachedDocument']:
+        assert name in XSD.SCHEMAS
+
+
+def test_xsd_lazy_import():
+    code = (
+        "import sys\n"
+        "from facho.fe.data.dian import XSD\n"
+        "print(len(XSD._schemas), 'xmlschema' in sys.modules)\n"
+    )
+    out = subprocess.check_output([sys.executable, '-c', code], text=True)
+    assert out.split() == ['0', 'False']
+
+
+def test_xsd_unknown_attribute():
+    with pytest.raises(AttributeError):
+        XSD.UBLDesconocido
+
+
+def test_xsd_schema_cached_per_process(monkeypatch):
+    compiled = []
+    monkeypatch.setattr(XSD, '_schemas', {})
+    monkeypatch.setitem(XSD.SCHEMAS, 'Prueba', ('maindoc', 'UBL-Invoice-2.1.xsd'))
+    monkeypatch.setattr(XSD, 'compile_schema', lambda path: compiled.append(path) or object())
+
+    assert XSD.Prueba is XSD.schema('Prueba')
+    assert compiled == [XSD.path_for_xsd('maindoc', 'UBL-Invoice-2.1.xsd')]
+
+
+def test_xsd_persisted(xsd_path, monkeypatch):
+    schema = XSD.compile_schema(xsd_path)
+    schema.validate('<Documento>abc</Documento>')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('schema compiled again')
+    monkeypatch.setattr(xmlschema, 'XMLSchema', fail)
+    persisted = XSD.compile_schema(xsd_path)
+    persisted.validate('<Documento>abc</Documento>')
+    with pytest.raises(xmlschema.XMLSchemaValidationError):
+        persisted.validate('<Documento>abcd</Documento>')
+
+
+def test_xsd_persisted_invalidated(xsd_path, tmpdir):
+    XSD.compile_schema(xsd_path)
+
+    # cambia un esquema incluido
+    types = tmpdir.join('types.xsd')
+    types.write(TYPES_TEMPLATE % (5))
+    types.setmtime(types.mtime() + 10)
+    XSD.compile_schema(xsd_path).validate('<Documento>abcde</Documento>')
+
+
+def test_xsd_not_persisted_without_cache_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(XSD, 'CACHE_DIR', None)
+    tmpdir.join('types.xsd').write(TYPES_TEMPLATE % (3))
+    path = tmpdir.join('documento.xsd')
+    path.write(XSD_TEMPLATE)
+
+    XSD.compile_schema(str(path))
+    assert sorted(os.listdir(str(tmpdir))) == ['documento.xsd', 'types.xsd']